@@ -10,7 +10,7 @@ bl_info = {
 
 import bpy
 
-from . import operators, ui
+from . import operators, scheduler, ui
 from .client import PlasticityClient
 from .handler import SceneHandler
 
@@ -22,6 +22,19 @@ def select_similar(self, context):
     self.layout.operator(operators.SelectByFaceIDOperator.bl_idname)
 
 
+@bpy.app.handlers.persistent
+def forget_scene_state(*args):
+    # NOTE: Undo, redo and loading a file invalidate every reference the handler keeps into bpy.data.
+    handler.forget()
+
+
+@bpy.app.handlers.persistent
+def cancel_apply(*args):
+    # NOTE: Updates still being applied belong to the file being closed.
+    if scheduler.apply_scheduler.running:
+        scheduler.apply_scheduler.cancel()
+
+
 def register():
     print("Registering Plasticity client")
 
@@ -32,6 +45,7 @@ def register():
     bpy.utils.register_class(ui.UnsubscribeAllButton)
     bpy.utils.register_class(ui.RefacetButton)
     bpy.utils.register_class(ui.PlasticityPanel)
+    bpy.utils.register_class(scheduler.ApplyOperator)
     bpy.utils.register_class(operators.SelectByFaceIDOperator)
     bpy.utils.register_class(operators.SelectByFaceIDEdgeOperator)
     bpy.utils.register_class(operators.AutoMarkEdgesOperator)
@@ -39,15 +53,73 @@ def register():
     bpy.utils.register_class(operators.PaintPlasticityFacesOperator)
 
     bpy.types.VIEW3D_MT_edit_mesh_select_similar.append(select_similar)
+    plasticity_client.dispatcher.start()
+    bpy.app.handlers.load_pre.append(cancel_apply)
+    bpy.app.handlers.load_post.append(operators.clear_face_groups)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+        handlers.append(forget_scene_state)
 
     bpy.types.Scene.prop_plasticity_server = bpy.props.StringProperty(
         name="Server", default="localhost:8980")
+    bpy.types.Scene.prop_plasticity_decode_backend = bpy.props.EnumProperty(
+        items=[
+            ("INLINE", "Inline", "Decode messages on the network thread"),
+            ("THREAD", "Thread", "Decode large messages on a worker thread"),
+        ],
+        name="Decode",
+        default="INLINE",
+    )
+    bpy.types.Scene.prop_plasticity_stream_lists = bpy.props.BoolProperty(
+        name="Incremental lists", description="Add objects of large lists while the rest is still being received",
+        default=False)
+    bpy.types.Scene.prop_plasticity_share_meshes = bpy.props.BoolProperty(
+        name="Share identical meshes", description="Link objects with identical geometry to one mesh datablock",
+        default=False)
+    bpy.types.Scene.prop_plasticity_cache_directory = bpy.props.StringProperty(
+        name="Cache directory", description="Where refaceted geometry is cached; empty for the user data directory",
+        default="", subtype='DIR_PATH')
+    bpy.types.Scene.prop_plasticity_cache_size = bpy.props.IntProperty(
+        name="Cache size", description="Maximum size of the geometry cache in MB; 0 disables it",
+        default=512, min=0, max=65536)
+    bpy.types.Scene.prop_plasticity_auto_reconnect = bpy.props.BoolProperty(
+        name="Reconnect automatically", description="Reconnect when the connection drops, and resume the live link",
+        default=True)
+    bpy.types.Scene.prop_plasticity_compression = bpy.props.EnumProperty(
+        items=[
+            ("OFF", "Off", "Never compress messages"),
+            ("FIXED", "Fixed", "Always offer permessage-deflate at the given level"),
+            ("ADAPTIVE", "Adaptive", "Compress only when the link is slow enough for it to pay off"),
+        ],
+        name="Compression",
+        default="ADAPTIVE",
+    )
+    bpy.types.Scene.prop_plasticity_compression_level = bpy.props.IntProperty(
+        name="Level", description="Deflate level of the messages sent to the server",
+        default=6, min=1, max=9)
+    bpy.types.Scene.prop_plasticity_compact_geometry = bpy.props.BoolProperty(
+        name="Compact geometry", description="Offer quantized positions, octahedral normals and 16-bit indices to the server",
+        default=True)
+    bpy.types.Scene.prop_plasticity_weld = bpy.props.BoolProperty(
+        name="Weld vertices", description="Merge coincident vertices of meshes received from the live link. Refaceted meshes are always welded",
+        default=False)
+    bpy.types.Scene.prop_plasticity_weld_distance = bpy.props.FloatProperty(
+        name="Weld distance", description="Merge vertices closer than half this along every axis, and some up to this far; no vertex moves farther than this along any axis. A distance can collapse thin triangles. 0 merges only identical positions",
+        default=0.0, min=0.0, max=1.0, step=0.001, precision=6)
+    bpy.types.Scene.prop_plasticity_legacy_face_groups = bpy.props.BoolProperty(
+        name="Legacy face groups", description="Also store face groups and face ids as mesh[\"groups\"] and mesh[\"face_ids\"] lists",
+        default=False)
     bpy.types.Scene.prop_plasticity_facet_tolerance = bpy.props.FloatProperty(
         name="Tolerance", default=0.01, min=0.0001, max=0.1, step=0.001, precision=6)
     bpy.types.Scene.prop_plasticity_facet_angle = bpy.props.FloatProperty(
         name="Angle", default=0.45, min=0.1, max=1.0)
     bpy.types.Scene.prop_plasticity_list_only_visible = bpy.props.BoolProperty(
         name="List only visible", default=False)
+    bpy.types.Scene.prop_plasticity_live_link_rate = bpy.props.FloatProperty(
+        name="Live link rate", description="Maximum number of live link updates applied per second",
+        default=10.0, min=1.0, max=60.0)
+    bpy.types.Scene.prop_plasticity_apply_budget = bpy.props.FloatProperty(
+        name="Apply budget", description="Milliseconds per frame spent applying received updates",
+        default=8.0, min=1.0, max=100.0)
     bpy.types.Scene.prop_plasticity_facet_tri_or_ngon = bpy.props.EnumProperty(
         items=[
             ("TRI", "Tri", "Tri"),
@@ -84,6 +156,7 @@ def unregister():
     print("Unregistering Plasticity client")
 
     bpy.utils.unregister_class(ui.PlasticityPanel)
+    bpy.utils.unregister_class(scheduler.ApplyOperator)
     bpy.utils.unregister_class(ui.DisconnectButton)
     bpy.utils.unregister_class(ui.ConnectButton)
     bpy.utils.unregister_class(ui.ListButton)
@@ -97,12 +170,40 @@ def unregister():
     bpy.utils.unregister_class(operators.PaintPlasticityFacesOperator)
 
     bpy.types.VIEW3D_MT_edit_mesh_select_similar.remove(select_similar)
+    if operators.clear_face_groups in bpy.app.handlers.load_post:
+        bpy.app.handlers.load_post.remove(operators.clear_face_groups)
+    if cancel_apply in bpy.app.handlers.load_pre:
+        bpy.app.handlers.load_pre.remove(cancel_apply)
+    for handlers in (bpy.app.handlers.undo_post, bpy.app.handlers.redo_post, bpy.app.handlers.load_post):
+        if forget_scene_state in handlers:
+            handlers.remove(forget_scene_state)
+    operators.face_group_index.clear()
+    operators.edge_mark_batch.shutdown()
+
+    plasticity_client.dispatcher.stop()
+    plasticity_client.decode_pool.shutdown()
+    plasticity_client.compression.shutdown()
+    plasticity_client.geometry_cache.flush()
 
     del bpy.types.Scene.prop_plasticity_server
+    del bpy.types.Scene.prop_plasticity_decode_backend
+    del bpy.types.Scene.prop_plasticity_stream_lists
+    del bpy.types.Scene.prop_plasticity_share_meshes
+    del bpy.types.Scene.prop_plasticity_cache_directory
+    del bpy.types.Scene.prop_plasticity_cache_size
+    del bpy.types.Scene.prop_plasticity_auto_reconnect
+    del bpy.types.Scene.prop_plasticity_compression
+    del bpy.types.Scene.prop_plasticity_compression_level
+    del bpy.types.Scene.prop_plasticity_compact_geometry
+    del bpy.types.Scene.prop_plasticity_weld
+    del bpy.types.Scene.prop_plasticity_weld_distance
+    del bpy.types.Scene.prop_plasticity_legacy_face_groups
     del bpy.types.Scene.prop_plasticity_facet_tolerance
     del bpy.types.Scene.prop_plasticity_facet_angle
     del bpy.types.Scene.prop_plasticity_facet_tri_or_ngon
     del bpy.types.Scene.prop_plasticity_list_only_visible
+    del bpy.types.Scene.prop_plasticity_live_link_rate
+    del bpy.types.Scene.prop_plasticity_apply_budget
     del bpy.types.Scene.prop_plasticity_ui_show_advanced_facet
     del bpy.types.Scene.prop_plasticity_facet_min_width
     del bpy.types.Scene.prop_plasticity_facet_max_width
@@ -0,0 +1,212 @@
+import time
+
+import numpy as np
+
+
+# NOTE: Per-polygon INT attributes: the index of the polygon's face group, and the Plasticity face id of that group.
+GROUP_ATTRIBUTE = "plasticity_group"
+FACE_ID_ATTRIBUTE = "plasticity_face_id"
+
+
+class MeshBuilder:
+    # NOTE: Fills an empty mesh (new, or after clear_geometry) from flat buffers: positions, corner vertex
+    # indices and per-vertex normals. Polygons are triangles unless faces (the polygon of each corner, in
+    # corner order) is given. Everything is converted once to the contiguous float32/int32 buffers that
+    # foreach_set copies without per-element conversion, and the mesh is updated exactly once. Face groups,
+    # (start, count) pairs over corners, become the GROUP_ATTRIBUTE and FACE_ID_ATTRIBUTE attributes.
+    stages = ("prepare", "geometry", "update", "normals", "attributes")
+
+    def __init__(self):
+        self.last = dict.fromkeys(self.stages, 0.0)
+        self.total = dict.fromkeys(self.stages, 0.0)
+        self.count = 0
+
+    def build(self, mesh, verts, indices, normals, faces=None, weld=None, groups=None, face_ids=None):
+        # NOTE: weld is None to keep the vertices as they are, or a tolerance for weld_vertices.
+        started = time.perf_counter()
+        timings = {}
+
+        co = np.ascontiguousarray(verts, dtype=np.float32).reshape(-1, 3)
+        indices = np.ascontiguousarray(indices, dtype=np.int32)
+        # NOTE: Normals are per wire vertex, so they are gathered with the indices from before welding.
+        corner_normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3)[indices]
+        vertex_index = indices
+        if weld is not None:
+            co, inverse = weld_vertices(co, weld)
+            vertex_index = inverse[indices]
+        loop_start, loop_total = polygon_loops(indices, faces)
+        started = self.__lap(timings, "prepare", started)
+
+        mesh.vertices.add(len(co))
+        mesh.vertices.foreach_set("co", co.reshape(-1))
+        mesh.loops.add(len(vertex_index))
+        mesh.loops.foreach_set("vertex_index", vertex_index)
+        mesh.polygons.add(len(loop_start))
+        mesh.polygons.foreach_set("loop_start", loop_start)
+        mesh.polygons.foreach_set("loop_total", loop_total)
+        started = self.__lap(timings, "geometry", started)
+
+        # NOTE: Computes the edges, which custom normals need.
+        mesh.update()
+        started = self.__lap(timings, "update", started)
+
+        mesh.polygons.foreach_set(
+            "use_smooth", np.ones(len(loop_start), dtype=bool))
+        mesh.normals_split_custom_set(corner_normals)
+        started = self.__lap(timings, "normals", started)
+
+        write_face_groups(mesh, loop_start, groups, face_ids)
+        self.__lap(timings, "attributes", started)
+
+        self.last = timings
+        self.count += 1
+        return mesh
+
+    def stats(self):
+        # NOTE: Milliseconds per stage, for the last build and averaged over all builds.
+        count = max(self.count, 1)
+        return {stage: {"last": self.last[stage] * 1000, "mean": self.total[stage] * 1000 / count}
+                for stage in self.stages}
+
+    def __lap(self, timings, stage, started):
+        now = time.perf_counter()
+        timings[stage] = now - started
+        self.total[stage] += now - started
+        return now
+
+
+def polygon_loops(indices, faces=None):
+    # NOTE: faces holds, for every corner, the polygon it belongs to; polygons start where it changes.
+    if faces is None or len(faces) == 0:
+        loop_start = np.arange(0, len(indices), 3, dtype=np.int32)
+        return loop_start, np.full(len(loop_start), 3, dtype=np.int32)
+
+    faces = np.asarray(faces)
+    loop_start = np.flatnonzero(faces[1:] != faces[:-1]).astype(np.int32)
+    loop_start += 1
+    loop_start = np.concatenate(
+        (np.zeros(1, dtype=np.int32), loop_start))
+    loop_total = np.diff(loop_start, append=np.int32(len(faces))).astype(np.int32)
+    return loop_start, loop_total
+
+
+def polygon_groups(loop_start, groups):
+    # NOTE: The group of each polygon is the last group starting at or before its first corner.
+    starts = np.asarray(groups, dtype=np.int32)[0::2]
+    index = np.searchsorted(starts, loop_start, side="right").astype(np.int32)
+    index -= 1
+    return index
+
+
+def write_face_groups(mesh, loop_start, groups, face_ids):
+    if groups is None or len(groups) == 0:
+        return
+    index = polygon_groups(loop_start, groups)
+    write_polygon_attribute(mesh, GROUP_ATTRIBUTE, index)
+    face_ids = np.asarray(face_ids, dtype=np.int32)
+    if len(face_ids) * 2 == len(groups):
+        write_polygon_attribute(mesh, FACE_ID_ATTRIBUTE, np.where(
+            index >= 0, face_ids[index], -1).astype(np.int32))
+
+
+def write_polygon_attribute(mesh, name, values):
+    attribute = mesh.attributes.get(name)
+    if attribute is not None and (attribute.data_type != 'INT' or attribute.domain != 'FACE'):
+        mesh.attributes.remove(attribute)
+        attribute = None
+    if attribute is None:
+        attribute = mesh.attributes.new(name, 'INT', 'FACE')
+    attribute.data.foreach_set("value", values)
+
+
+def weld_vertices(co, tolerance=0.0):
+    # NOTE: Returns (welded, inverse) such that welded[inverse] == co up to tolerance. Welded vertices are in
+    # order of first occurrence, and each takes the position of its first occurrence. With a tolerance,
+    # positions are snapped to a grid of that size and merged by cell. Points on either side of a cell
+    # boundary would stay apart, so the vertices merged so far are merged again on the grid shifted by half
+    # a cell along every combination of axes: points closer than half the tolerance along each axis share a
+    # cell in at least one of the eight grids, unless that would move a point too far. Merges could chain
+    # from grid to grid, so a vertex is only merged into another if all of its points stay within the
+    # tolerance of the other's position along each axis: no point ever moves farther than that.
+    co = np.asarray(co, dtype=np.float32).reshape(-1, 3)
+    if len(co) == 0:
+        return co, np.empty(0, dtype=np.int32)
+    if tolerance <= 0:
+        # NOTE: Adding 0 turns -0.0 into 0.0, so that the bit patterns compare like the values.
+        return weld_keys(co, (co + np.float32(0)).view(np.uint32).astype(np.int64))
+
+    scale = np.float32(1 / tolerance)
+    welded, inverse = weld_keys(co, np.floor(co * scale + np.float32(0.5)).astype(np.int64))
+    # NOTE: How far, along any axis, the points of every welded vertex are from its position at most.
+    reach = np.zeros(len(welded), dtype=np.float32)
+    np.maximum.at(reach, inverse, axis_distance(co, welded[inverse]))
+    for shift in grid_shifts[1:]:
+        first, group = group_rows(np.floor(welded * scale + shift).astype(np.int64))
+        # NOTE: The first vertex of a cell comes first among them, and is always kept.
+        target = first[group]
+        reach_target = reach + axis_distance(welded, welded[target])
+        within = reach_target <= tolerance
+        target = np.where(within, target, np.arange(len(welded), dtype=target.dtype))
+        kept = target == np.arange(len(welded))
+        merged = (np.cumsum(kept, dtype=np.int32) - 1)[target]
+        welded = welded[kept]
+        reach = reach[kept]
+        np.maximum.at(reach, merged[within], reach_target[within])
+        inverse = merged[inverse]
+    return welded, inverse
+
+
+def axis_distance(a, b):
+    # NOTE: The largest distance along any axis between the rows of a and b. Faster than .max(1) on (n, 3).
+    difference = np.abs(a - b)
+    return np.maximum(np.maximum(difference[:, 0], difference[:, 1]), difference[:, 2])
+
+
+# NOTE: Offsets of the eight grids, in cells: 0.5 centers the cells on the grid points, 0 shifts them by half.
+grid_shifts = np.array([[(shift >> axis & 1) * -0.5 + 0.5 for axis in range(3)]
+                        for shift in range(8)], dtype=np.float32)
+
+
+def weld_keys(co, keys):
+    # NOTE: Merges the points with equal int64 key triples; see weld_vertices.
+    first, inverse = group_rows(keys)
+    # NOTE: Groups are ordered by hash; renumber them by first occurrence instead.
+    order = np.argsort(first)
+    rank = np.empty(len(order), dtype=np.int32)
+    rank[order] = np.arange(len(order), dtype=np.int32)
+    return np.ascontiguousarray(co[first[order]]), rank[inverse]
+
+
+def group_rows(keys):
+    # NOTE: Returns (first, inverse): the first row of every group of equal rows, and the group of every row.
+    hashes = hash_rows(keys)
+    order = np.argsort(hashes)
+    hashes = hashes[order]
+    starts = np.flatnonzero(np.diff(hashes, prepend=~hashes[0]))
+    first = np.minimum.reduceat(order, starts)
+    inverse = np.empty(len(order), dtype=np.int32)
+    inverse[order] = np.repeat(np.arange(len(starts), dtype=np.int32),
+                               np.diff(starts, append=len(order)))
+    if np.array_equal(keys[first][inverse], keys):
+        return first, inverse
+
+    # NOTE: Two different keys hashed alike; fall back to comparing the keys themselves.
+    keys = np.ascontiguousarray(keys).view(
+        np.dtype((np.void, keys.itemsize * 3))).reshape(-1)
+    _, first, inverse = np.unique(
+        keys, return_index=True, return_inverse=True)
+    return first, inverse.reshape(-1).astype(np.int32)
+
+
+def hash_rows(keys):
+    # NOTE: keys are int64 triples; mixes them into one uint64 (multiply-xorshift, wrapping on overflow).
+    keys = keys.view(np.uint64)
+    hashes = keys[:, 0] * np.uint64(0x9E3779B97F4A7C15)
+    for column, multiplier in ((1, 0xC2B2AE3D27D4EB4F), (2, 0x165667B19E3779F9)):
+        hashes ^= hashes >> np.uint64(29)
+        hashes += keys[:, column] * np.uint64(multiplier)
+    hashes ^= hashes >> np.uint64(32)
+    return hashes
+
+
+mesh_builder = MeshBuilder()
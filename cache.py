@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# NOTE: faces, positions, indices, normals, groups, face_ids of a refaceted item, in that order.
+REFACET_FIELDS = (np.int32, np.float32, np.int32, np.float32, np.int32, np.int32)
+
+
+class GeometryCache:
+    # NOTE: Decoded geometry on disk, one flat file per (filename, plasticity_id, version, facet params).
+    # Entries are memory-mapped on read, so a hit costs no copy until Blender consumes the arrays. The
+    # least recently used entries are evicted once the total size exceeds max_bytes.
+    index_name = "index.json"
+
+    def __init__(self):
+        self.directory = None
+        self.max_bytes = 0
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, directory, max_bytes):
+        with self.lock:
+            if directory != self.directory:
+                self.directory = directory
+                self.entries = OrderedDict()
+                self.size = 0
+                if directory is not None:
+                    os.makedirs(directory, exist_ok=True)
+                    self.__load()
+            self.max_bytes = max_bytes
+            self.__evict()
+
+    @staticmethod
+    def key(filename, plasticity_id, version, params):
+        return hashlib.sha1(repr((filename, plasticity_id, version, params)).encode("utf-8")).hexdigest()
+
+    def get(self, filename, plasticity_id, version, params, fields=REFACET_FIELDS):
+        key = self.key(filename, plasticity_id, version, params)
+        with self.lock:
+            entry = self.entries.get(key) if self.directory is not None else None
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                data = np.memmap(self.__path(key), dtype=np.uint8, mode="r")
+            except (OSError, ValueError):
+                self.__drop(key)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+
+        arrays = []
+        offset = 0
+        for dtype, count in zip(fields, entry["counts"]):
+            size = count * np.dtype(dtype).itemsize
+            arrays.append(data[offset:offset + size].view(dtype))
+            offset += size
+        return arrays
+
+    def put(self, filename, plasticity_id, version, params, arrays, fields=REFACET_FIELDS):
+        if self.directory is None:
+            return
+        key = self.key(filename, plasticity_id, version, params)
+        arrays = [np.ascontiguousarray(array, dtype=dtype)
+                  for dtype, array in zip(fields, arrays)]
+        size = sum(array.nbytes for array in arrays)
+        if size > self.max_bytes:
+            return
+
+        path = self.__path(key)
+        try:
+            with open(path + ".tmp", "wb") as f:
+                for array in arrays:
+                    f.write(memoryview(array).cast("B"))
+            os.replace(path + ".tmp", path)
+        except OSError:
+            return
+
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)["size"]
+            self.entries[key] = {"size": size,
+                                 "counts": [len(array) for array in arrays]}
+            self.size += size
+            self.__evict()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self.entries), "size": self.size}
+
+    def flush(self):
+        with self.lock:
+            if self.directory is None:
+                return
+            path = os.path.join(self.directory, self.index_name)
+            try:
+                with open(path + ".tmp", "w") as f:
+                    json.dump([[key, entry["size"], entry["counts"]]
+                               for key, entry in self.entries.items()], f)
+                os.replace(path + ".tmp", path)
+            except OSError:
+                pass
+
+    def __path(self, key):
+        return os.path.join(self.directory, key + ".bin")
+
+    def __load(self):
+        try:
+            with open(os.path.join(self.directory, self.index_name)) as f:
+                saved = json.load(f)
+        except (OSError, ValueError):
+            return
+        for key, size, counts in saved:
+            if os.path.exists(self.__path(key)):
+                self.entries[key] = {"size": size, "counts": counts}
+                self.size += size
+
+    def __evict(self):
+        while self.size > self.max_bytes and len(self.entries) > 0:
+            self.__drop(next(iter(self.entries)))
+
+    def __drop(self, key):
+        self.size -= self.entries.pop(key)["size"]
+        try:
+            os.remove(self.__path(key))
+        except OSError:
+            # NOTE: On Windows a file can't be removed while it is still mapped; it is overwritten if reused.
+            pass
@@ -1,46 +1,35 @@
 import asyncio
-import struct
+import random
 import threading
+import time
 import weakref
 from asyncio import run_coroutine_threadsafe
 from enum import Enum
 
-import bpy
 import numpy as np
 
+from .cache import GeometryCache
+from .coalescer import TransactionCoalescer
+from .compression import CompressionMode, CompressionPolicy
+from .dispatcher import MainThreadDispatcher
+from .decoder import (COMPACT_GEOMETRY, MessageType, decode_refacet,
+                      decode_transaction)
+from .encoder import (encode_refacet_some, encode_request,
+                      encode_subscribe_some)
 from .libs.websockets import client
 from .libs.websockets.exceptions import (ConnectionClosed, InvalidURI,
                                          WebSocketException)
+from .pending import PendingRequests
+from .streaming import ListStream, StreamedMessage, StreamingClientProtocol
+from .workers import DecodeBackend, DecodePool
 
 max_size = 2 ** 32 - 1
-
-
-class MessageType(Enum):
-    TRANSACTION_1 = 0
-    ADD_1 = 1
-    UPDATE_1 = 2
-    DELETE_1 = 3
-    MOVE_1 = 4
-    ATTRIBUTE_1 = 5
-
-    NEW_VERSION_1 = 10
-    NEW_FILE_1 = 11
-
-    LIST_ALL_1 = 20
-    LIST_SOME_1 = 21
-    LIST_VISIBLE_1 = 22
-    SUBSCRIBE_ALL_1 = 23
-    SUBSCRIBE_SOME_1 = 24
-    UNSUBSCRIBE_ALL_1 = 25
-    REFACET_SOME_1 = 26
-
-
-class ObjectType(Enum):
-    SOLID = 0
-    SHEET = 1
-    WIRE = 2
-    GROUP = 5
-    EMPTY = 6
+# NOTE: Seconds to wait for a response before the request is given up and its response treated as stale.
+list_timeout = 300.0
+refacet_timeout = 120.0
+# NOTE: Seconds before the first reconnect attempt; doubled after every failed attempt, up to the maximum.
+reconnect_delay = 0.5
+max_reconnect_delay = 30.0
 
 
 class FacetShapeType(Enum):
@@ -49,6 +38,13 @@ class FacetShapeType(Enum):
     CONVEX = 20502
 
 
+def facet_params(relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle, match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape):
+    # NOTE: Floats are sent as float32, so they are compared as float32 too.
+    floats = np.array([curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle,
+                      plane_angle, min_width, max_width, curve_chord_max], dtype=np.float32)
+    return (bool(relative_to_bbox), bool(match_topology), max_sides, shape.value) + tuple(floats.tolist())
+
+
 class PlasticityClient:
     def __init__(self, handler):
         self.server = None
@@ -59,84 +55,93 @@ class PlasticityClient:
         self.message_id = 0
         self.handler = handler
         self.loop = asyncio.new_event_loop()
-
-    def list_all(self):
+        self.decode_pool = DecodePool()
+        self.dispatcher = MainThreadDispatcher()
+        self.coalescer = TransactionCoalescer(handler, self.dispatcher)
+        self.stream_lists = False
+        self.geometry_cache = GeometryCache()
+        self.pending = PendingRequests(self.__on_timeout)
+        self.auto_reconnect = False
+        self.reconnecting = False
+        self.closing = False
+        self.was_subscribed = False
+        self.stop_reconnecting = None
+        self.compression = CompressionPolicy()
+        self.compressed = False
+        self.offer_compact_geometry = True
+        self.compact_geometry = False
+        # NOTE: Files whose objects are known to have Plasticity's latest versions: listed in full on this
+        # connection, with no new version since, other than the ones the live link delivered.
+        self.current_files = set()
+
+    def list_all(self, on_done=None, on_error=None):
         if self.connected:
             self.report({'INFO'}, "Refreshing available meshes...")
 
-            future = run_coroutine_threadsafe(
-                self.list_all_async(), self.loop)
-            future.result()
+            self.__run(self.list_all_async(), on_done, on_error)
 
     async def list_all_async(self):
         self.message_id += 1
 
-        get_objects_message = struct.pack(
-            "<I", MessageType.LIST_ALL_1.value)
-        get_objects_message += struct.pack(
-            "<I", self.message_id)
-        await self.websocket.send(get_objects_message)
+        request = self.pending.register(
+            MessageType.LIST_ALL_1, self.message_id, list_timeout)
+
+        get_objects_message = encode_request(
+            MessageType.LIST_ALL_1, self.message_id)
+        await self.__send(request, get_objects_message)
+        return request.future
 
-    def list_visible(self):
+    def list_visible(self, on_done=None, on_error=None):
         if self.connected:
             self.report({'INFO'}, "Refreshing visible meshes...")
 
-            future = run_coroutine_threadsafe(
-                self.list_visible_async(), self.loop)
-            future.result()
+            self.__run(self.list_visible_async(), on_done, on_error)
 
     async def list_visible_async(self):
         self.message_id += 1
 
-        get_objects_message = struct.pack(
-            "<I", MessageType.LIST_VISIBLE_1.value)
-        get_objects_message += struct.pack(
-            "<I", self.message_id)
-        await self.websocket.send(get_objects_message)
+        request = self.pending.register(
+            MessageType.LIST_VISIBLE_1, self.message_id, list_timeout)
 
-    def subscribe_all(self):
+        get_objects_message = encode_request(
+            MessageType.LIST_VISIBLE_1, self.message_id)
+        await self.__send(request, get_objects_message)
+        return request.future
+
+    def subscribe_all(self, on_done=None, on_error=None):
         if self.connected:
             self.report({'INFO'}, "Subscribing to all meshes...")
 
-            future = run_coroutine_threadsafe(
-                self.subscribe_all_async(), self.loop)
-            future.result()
-            self.subscribed = True
+            self.__run(self.subscribe_all_async(),
+                       lambda result: self.__set_subscribed(True, on_done, result), on_error)
 
     async def subscribe_all_async(self):
         self.message_id += 1
 
-        subscribe_message = struct.pack(
-            "<I", MessageType.SUBSCRIBE_ALL_1.value)
-        subscribe_message += struct.pack(
-            "<I", self.message_id)
+        subscribe_message = encode_request(
+            MessageType.SUBSCRIBE_ALL_1, self.message_id)
         await self.websocket.send(subscribe_message)
 
-    def unsubscribe_all(self):
+    def unsubscribe_all(self, on_done=None, on_error=None):
         if self.connected:
             self.report({'INFO'}, "Unsubscribing to all meshes...")
 
-            future = run_coroutine_threadsafe(
-                self.unsubscribe_all_async(), self.loop)
-            future.result()
-            self.subscribed = False
+            self.__run(self.unsubscribe_all_async(),
+                       lambda result: self.__set_subscribed(False, on_done, result), on_error)
 
     async def unsubscribe_all_async(self):
         self.message_id += 1
 
-        subscribe_message = struct.pack(
-            "<I", MessageType.UNSUBSCRIBE_ALL_1.value)
-        subscribe_message += struct.pack(
-            "<I", self.message_id)
+        subscribe_message = encode_request(
+            MessageType.UNSUBSCRIBE_ALL_1, self.message_id)
         await self.websocket.send(subscribe_message)
 
-    def subscribe_some(self, filename, plasticity_ids):
+    def subscribe_some(self, filename, plasticity_ids, on_done=None, on_error=None):
         if self.connected:
             self.report({'INFO'}, "Subscribing to meshes...")
 
-            future = run_coroutine_threadsafe(
-                self.subscribe_some_async(filename, plasticity_ids), self.loop)
-            future.result()
+            self.__run(self.subscribe_some_async(
+                filename, plasticity_ids), on_done, on_error)
 
     async def subscribe_some_async(self, filename, plasticity_ids):
         if len(plasticity_ids) == 0:
@@ -144,82 +149,43 @@ class PlasticityClient:
 
         self.message_id += 1
 
-        subscribe_message = struct.pack(
-            "<I", MessageType.SUBSCRIBE_SOME_1.value)
-        subscribe_message += struct.pack(
-            "<I", self.message_id)
-        subscribe_message += struct.pack(
-            "<I", len(filename))
-        subscribe_message += struct.pack(
-            f"<{len(filename)}s", filename.encode('utf-8'))
-        padding = (4 - (len(filename) % 4)) % 4
-        subscribe_message += struct.pack(
-            f"<{padding}x")
-        subscribe_message += struct.pack(
-            "<I", len(plasticity_ids))
-        for plasticity_id in plasticity_ids:
-            subscribe_message += struct.pack(
-                "<I", plasticity_id)
+        subscribe_message = encode_subscribe_some(
+            self.message_id, filename, plasticity_ids)
         await self.websocket.send(subscribe_message)
 
-    def refacet_some(self, filename, plasticity_ids, relative_to_bbox=True, curve_chord_tolerance=0.01, curve_chord_angle=0.35, surface_plane_tolerance=0.01, surface_plane_angle=0.35, match_topology=True, max_sides=3, plane_angle=0, min_width=0, max_width=0, curve_chord_max=0, shape=FacetShapeType.CUT):
+    def refacet_some(self, filename, plasticity_ids, relative_to_bbox=True, curve_chord_tolerance=0.01, curve_chord_angle=0.35, surface_plane_tolerance=0.01, surface_plane_angle=0.35, match_topology=True, max_sides=3, plane_angle=0, min_width=0, max_width=0, curve_chord_max=0, shape=FacetShapeType.CUT, on_done=None, on_error=None):
         if self.connected:
             self.report({'INFO'}, "Refaceting meshes...")
 
-            future = run_coroutine_threadsafe(
-                self.refacet_some_async(filename, plasticity_ids, relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle, match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape), self.loop)
-            future.result()
+            self.__run(self.refacet_some_async(filename, plasticity_ids, relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle, match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape), on_done, on_error)
 
     async def refacet_some_async(self, filename, plasticity_ids, relative_to_bbox=True, curve_chord_tolerance=0.01, curve_chord_angle=0.35, surface_plane_tolerance=0.01, surface_plane_angle=0.35, match_topology=True, max_sides=3, plane_angle=0, min_width=0, max_width=0, curve_chord_max=0, shape=FacetShapeType.CUT):
         if len(plasticity_ids) == 0:
             return
 
         self.message_id += 1
+        request = self.pending.register(MessageType.REFACET_SOME_1, self.message_id, refacet_timeout, (filename, facet_params(
+            relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle, match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape)))
+
+        refacet_message = encode_refacet_some(self.message_id, filename, plasticity_ids, relative_to_bbox, curve_chord_tolerance, curve_chord_angle,
+                                              surface_plane_tolerance, surface_plane_angle, match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape)
+
+        await self.__send(request, refacet_message)
+        return request.future
 
-        refacet_message = struct.pack(
-            "<I", MessageType.REFACET_SOME_1.value)
-        refacet_message += struct.pack(
-            "<I", self.message_id)
-        refacet_message += struct.pack(
-            "<I", len(filename))
-        refacet_message += struct.pack(
-            f"<{len(filename)}s", filename.encode('utf-8'))
-        padding = (4 - (len(filename) % 4)) % 4
-        refacet_message += struct.pack(
-            f"<{padding}x")
-        refacet_message += struct.pack(
-            "<I", len(plasticity_ids))
-        for plasticity_id in plasticity_ids:
-            refacet_message += struct.pack(
-                "<I", plasticity_id)
-        refacet_message += struct.pack(
-            "<I", relative_to_bbox)
-        refacet_message += struct.pack(
-            "<f", curve_chord_tolerance)
-        refacet_message += struct.pack(
-            "<f", curve_chord_angle)
-        refacet_message += struct.pack(
-            "<f", surface_plane_tolerance)
-        refacet_message += struct.pack(
-            "<f", surface_plane_angle)
-        refacet_message += struct.pack(
-            "<I", 1 if match_topology else 0)
-        refacet_message += struct.pack(
-            "<I", max_sides)
-        refacet_message += struct.pack(
-            "<f", plane_angle)
-        refacet_message += struct.pack(
-            "<f", min_width)
-        refacet_message += struct.pack(
-            "<f", max_width)
-        refacet_message += struct.pack(
-            "<f", curve_chord_max)
-        refacet_message += struct.pack(
-            "<I", shape.value)
-
-        await self.websocket.send(refacet_message)
-
-    def connect(self, server):
+    async def __send(self, request, message):
+        try:
+            await self.websocket.send(message)
+        except Exception as e:
+            self.pending.reject(request.message_id, e)
+            raise
+
+    def connect(self, server, decode_backend=DecodeBackend.INLINE, stream_lists=False, auto_reconnect=False, compression=CompressionMode.ADAPTIVE, compression_level=6, compact_geometry=True):
+        self.decode_pool.configure(decode_backend)
+        self.offer_compact_geometry = compact_geometry
+        self.compression.configure(compression, compression_level)
+        self.stream_lists = stream_lists
+        self.auto_reconnect = auto_reconnect
         loop = self.loop
         websocket_thread = threading.Thread(
             target=loop.run_until_complete, args=(loop.create_task(self.connect_async(server)),))
@@ -227,15 +193,69 @@ class PlasticityClient:
         websocket_thread.start()
 
     async def connect_async(self, server):
+        # NOTE: If the connection drops after it was established, reconnect with exponential backoff until
+        # disconnect() is called, then resume: resubscribe if the live link was on, and list again. The
+        # handler skips objects whose plasticity_version is unchanged, so only what changed while
+        # disconnected is rebuilt.
+        self.closing = False
+        self.stop_reconnecting = asyncio.Event()
+        resume = None
+        delay = reconnect_delay
+        while True:
+            established = await self.__connect_once(server, resume)
+            if established:
+                delay = reconnect_delay
+                resume = {"subscribed": self.was_subscribed}
+            if self.closing or not self.auto_reconnect or resume is None:
+                break
+
+            wait = delay * random.uniform(0.8, 1.2)
+            self.reconnecting = True
+            self.report(
+                {'INFO'}, f"Reconnecting to {server} in {wait:.1f}s")
+            try:
+                await asyncio.wait_for(self.stop_reconnecting.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, max_reconnect_delay)
+            if self.closing:
+                break
+        self.reconnecting = False
+
+    async def __connect_once(self, server, resume):
         self.report({'INFO'}, "Connecting to server: " + server)
+        established = False
         try:
-            async with client.connect("ws://" + server, max_size=max_size) as ws:
+            options = self.compression.connect_options(server)
+            # NOTE: A server that doesn't know the subprotocol selects none, and geometry stays in the regular encoding.
+            subprotocols = [COMPACT_GEOMETRY] if self.offer_compact_geometry else None
+            async with client.connect("ws://" + server, max_size=max_size, create_protocol=StreamingClientProtocol, subprotocols=subprotocols, **options) as ws:
                 self.report({'INFO'}, "Connected to server")
+                self.compact_geometry = ws.subprotocol == COMPACT_GEOMETRY
+                if self.compact_geometry:
+                    self.report({'INFO'}, "Geometry: compact")
+                if self.stream_lists:
+                    ws.on_stream = self.__stream_list
+                self.compressed = len(ws.extensions) > 0
+                if self.compressed:
+                    self.report(
+                        {'INFO'}, f"Compression: {ws.extensions[0].name}")
+                    ws.inflater = self.compression.executor()
+                ws.on_sample = lambda *sample: self.__on_sample(
+                    server, *sample)
                 self.websocket = weakref.proxy(ws)
                 self.connected = True
+                self.reconnecting = False
                 self.message_id = 0
                 self.server = server
-                self.handler.on_connect()
+                established = True
+                self.dispatcher.post(self.handler.on_connect)
+
+                if resume is not None:
+                    if resume["subscribed"]:
+                        await self.subscribe_all_async()
+                        self.subscribed = True
+                    await self.list_all_async()
 
                 while True:
                     try:
@@ -248,21 +268,13 @@ class PlasticityClient:
                     except ConnectionClosed as e:
                         self.report(
                             {'INFO'}, f"Disconnected from server: {e}")
-                        self.connected = False
-                        self.websocket = None
-                        self.filename = None
-                        self.subscribed = False
-                        self.handler.on_disconnect()
+                        self.__on_connection_lost()
                         break
                     except Exception as e:
                         self.report({'ERROR'}, f"Exception: {e}")
         except ConnectionClosed:
             self.report({'INFO'}, "Disconnected from server")
-            self.connected = False
-            self.websocket = None
-            self.filename = None
-            self.subscribed = False
-            self.handler.on_disconnect()
+            self.__on_connection_lost()
         except InvalidURI:
             self.report(
                 {'ERROR'}, "Invalid URI for the WebSocket server")
@@ -274,250 +286,171 @@ class PlasticityClient:
                 {'ERROR'}, f"Unable to connect to the server: {e}")
         except Exception as e:
             self.report({'ERROR'}, f"Unknown error: {e}")
+        return established
+
+    def __on_connection_lost(self):
+        if self.connected:
+            self.was_subscribed = self.subscribed
+        self.connected = False
+        self.websocket = None
+        self.filename = None
+        self.subscribed = False
+        self.current_files.clear()
+        self.coalescer.clear()
+        self.pending.cancel_all()
+        self.dispatcher.post(self.handler.on_disconnect)
+
+    def is_stale(self, message_id):
+        # NOTE: A response to a request this client sent, but which is no longer pending because it timed out
+        # or was answered already. Responses with ids this client never used are not considered stale.
+        if self.pending.get(message_id) is None and 0 < message_id <= self.message_id:
+            self.report(
+                {'INFO'}, f"Dropping stale response to message {message_id}")
+            return True
+        return False
+
+    def __on_timeout(self, request):
+        self.report(
+            {'ERROR'}, f"No response to {request.message_type.name} request {request.message_id}")
+        self.dispatcher.post(lambda: self.handler.on_timeout(
+            request.message_type, request.message_id))
+
+    def __stream_list(self, message):
+        return ListStream(self, message)
 
     async def on_message(self, ws, message):
-        view = memoryview(message)
-        offset = 0
-        message_type = MessageType(
-            int.from_bytes(view[offset:offset + 4], 'little'))
-        offset += 4
+        if isinstance(message, StreamedMessage) and message.handled:
+            return
+
+        (message_type, index), buffer = await self.decode_pool.index(message, self.compact_geometry)
 
         if message_type == MessageType.TRANSACTION_1:
-            self.__on_transaction(view, offset, update_only=True)
+            await self.__on_transaction(index, buffer, update_only=True)
 
         elif message_type == MessageType.LIST_ALL_1 or message_type == MessageType.LIST_SOME_1 or message_type == MessageType.LIST_VISIBLE_1:
-            message_id = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
-
-            code = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
+            if self.is_stale(index["message_id"]):
+                return
 
+            code = index["code"]
             if code != 200:
                 self.report({'ERROR'}, f"List all failed with code: {code}")
+                self.pending.reject(index["message_id"], RuntimeError(
+                    f"List all failed with code: {code}"))
                 return
 
             # NOTE: ListAll only has an Add message inside it so it is a bit unlike a regular transaction
-            self.__on_transaction(view, offset, update_only=False)
+            await self.__on_transaction(index, buffer, update_only=False)
+            self.pending.resolve(index["message_id"], index["version"])
+            if message_type == MessageType.LIST_ALL_1:
+                self.current_files.add(index["filename"])
 
         elif message_type == MessageType.NEW_VERSION_1:
-            filename_length = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
-
-            filename = view[offset:offset +
-                            filename_length].tobytes().decode('utf-8')
-            offset += filename_length
+            filename = index["filename"]
+            version = index["version"]
 
             self.filename = filename
+            if not self.subscribed:
+                self.current_files.discard(filename)
 
-            # Add string padding for byte alignment
-            padding = (4 - (filename_length % 4)) % 4
-            offset += padding
-
-            version = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
-
-            bpy.app.timers.register(
-                lambda: self.handler.on_new_version(filename, version), first_interval=0.001)
+            self.dispatcher.post(lambda: self.handler.on_new_version(
+                filename, version), key=("new_version", filename))
 
         elif message_type == MessageType.NEW_FILE_1:
-            filename_length = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
-
-            filename = view[offset:offset +
-                            filename_length].tobytes().decode('utf-8')
-            offset += filename_length
+            filename = index["filename"]
 
             self.filename = filename
 
-            bpy.app.timers.register(
-                lambda: self.handler.on_new_file(filename), first_interval=0.001)
+            self.dispatcher.post(lambda: self.handler.on_new_file(
+                filename), key=("new_file", filename))
 
         elif message_type == MessageType.REFACET_SOME_1:
-            self.__on_refacet(view, offset)
-
-    def __on_transaction(self, view, offset, update_only):
-        filename_length = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        filename = view[offset:offset +
-                        filename_length].tobytes().decode('utf-8')
-        offset += filename_length
-
-        self.filename = filename
-
-        # Add string padding for byte alignment
-        padding = (4 - (filename_length % 4)) % 4
-        offset += padding
-
-        version = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
+            await self.__on_refacet(index, buffer)
 
-        num_messages = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
+    async def __on_transaction(self, index, buffer, update_only):
+        self.filename = index["filename"]
 
-        self.report({'INFO'}, f"Filename: {filename}")
-        self.report({'INFO'}, f"Version: {version}")
-        self.report({'INFO'}, f"Num messages: {num_messages}")
+        self.report({'INFO'}, f"Filename: {index['filename']}")
+        self.report({'INFO'}, f"Version: {index['version']}")
+        self.report(
+            {'INFO'}, f"Num objects: {len(index['add']) + len(index['update'])}, deleted: {len(index['delete'])}")
 
-        transaction = {"filename": filename, "version": version,
-                       "delete": [], "add": [], "update": []}
-        for _ in range(num_messages):
-            item_length = int.from_bytes(
-                view[offset:offset + 4], 'little')
-            offset += 4
-
-            self.on_message_item(
-                view[offset:offset + item_length], transaction)
-            offset += item_length
+        started = time.perf_counter()
+        transaction = await self.decode_pool.decode(decode_transaction, index, buffer)
+        self.report(
+            {'INFO'}, f"Geometry: {'compact' if index['compact'] else 'regular'}, {len(buffer)} bytes, decoded in {(time.perf_counter() - started) * 1000:.1f} ms")
 
         if update_only:
-            bpy.app.timers.register(lambda: self.handler.on_transaction(
-                transaction), first_interval=0.001)
+            self.coalescer.push(transaction)
         else:
-            bpy.app.timers.register(lambda: self.handler.on_list(
-                transaction), first_interval=0.001)
-
-    def __on_refacet(self, view, offset):
-        message_id = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
+            self.coalescer.discard(transaction["filename"])
+            # NOTE: A list is a snapshot of the whole file, so it supersedes one of the same file still waiting.
+            self.dispatcher.post(lambda: self.handler.on_list(
+                transaction), key=("list", transaction["filename"]))
 
-        code = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
+    async def __on_refacet(self, index, buffer):
+        if self.is_stale(index["message_id"]):
+            return
 
+        code = index["code"]
         if code != 200:
             self.report({'ERROR'}, f"Refacet failed with code: {code}")
+            self.pending.reject(index["message_id"], RuntimeError(
+                f"Refacet failed with code: {code}"))
             return
 
-        filename_length = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        filename = view[offset:offset +
-                        filename_length].tobytes().decode('utf-8')
-        offset += filename_length
+        filename = index["filename"]
+        file_version = index["version"]
 
         self.filename = filename
 
-        # Add string padding for byte alignment
-        padding = (4 - (filename_length % 4)) % 4
-        offset += padding
-
-        file_version = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        num_items = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        self.report({'INFO'}, f"Message ID: {message_id}")
-        self.report({'INFO'}, f"Num items: {num_items}")
-
-        plasticity_ids = []
-        versions = []
-        faces = []
-        positions = []
-        indices = []
-        normals = []
-        groups = []
-        face_ids = []
-
-        for _ in range(num_items):
-            plasticity_id = int.from_bytes(
-                view[offset:offset + 4], 'little')
-            offset += 4
-
-            version = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
-
-            num_face_facets = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
-
-            face = np.frombuffer(
-                view[offset:offset + num_face_facets * 4], dtype=np.int32)
-            offset += num_face_facets * 4
-
-            num_positions = int.from_bytes(
-                view[offset:offset + 4], 'little')
-            offset += 4
-
-            position = np.frombuffer(
-                view[offset:offset + num_positions * 4], dtype=np.float32)
-            offset += num_positions * 4
-
-            num_index = int.from_bytes(view[offset:offset + 4], 'little')
-            offset += 4
-
-            index = np.frombuffer(
-                view[offset:offset + num_index * 4], dtype=np.int32)
-            offset += num_index * 4
-
-            num_normals = int.from_bytes(
-                view[offset:offset + 4], 'little')
-            offset += 4
-
-            normal = np.frombuffer(
-                view[offset:offset + num_normals * 4], dtype=np.float32)
-            offset += num_normals * 4
-
-            num_groups = int.from_bytes(
-                view[offset:offset + 4], 'little')
-            offset += 4
-
-            group = np.frombuffer(
-                view[offset:offset + num_groups * 4], dtype=np.int32)
-            offset += num_groups * 4
-            # NOTE: As of blender 4.2, the concrete type of user attributes cannot be numpy arrays.
-            group = group.tolist()
-
-            num_face_ids = int.from_bytes(
-                view[offset:offset + 4], 'little')
-            offset += 4
-
-            face_id = np.frombuffer(
-                view[offset:offset + num_face_ids * 4], dtype=np.int32)
-            offset += num_face_ids * 4
-            # NOTE: As of blender 4.2, the concrete type of user attributes cannot be numpy arrays.
-            face_id = face_id.tolist()
-
-            plasticity_ids.append(plasticity_id)
-            versions.append(version)
-            faces.append(face)
-            positions.append(position)
-            indices.append(index)
-            normals.append(normal)
-            groups.append(group)
-            face_ids.append(face_id)
-
-        bpy.app.timers.register(lambda: self.handler.on_refacet(filename, file_version, plasticity_ids,
-                                versions, faces, positions, indices, normals, groups, face_ids), first_interval=0.001)
-
-    def on_message_item(self, view, transaction):
-        offset = 0
-        message_type = MessageType(
-            int.from_bytes(view[offset:offset + 4], 'little'))
-        offset += 4
-
-        self.report({'INFO'}, f"Message type: {message_type}")
-
-        if message_type == MessageType.DELETE_1:
-            num_objects = int.from_bytes(view[:4], 'little')
-            offset += 4
-            transaction["delete"].extend(
-                np.frombuffer(view[offset:offset + num_objects * 4], dtype=np.int32))
-        elif message_type == MessageType.ADD_1:
-            transaction["add"].extend(decode_objects(view[4:]))
-        elif message_type == MessageType.UPDATE_1:
-            transaction["update"].extend(decode_objects(view[4:]))
-
-    def disconnect(self):
-        if self.connected:
+        self.report({'INFO'}, f"Message ID: {index['message_id']}")
+        self.report({'INFO'}, f"Num items: {len(index['items'])}")
+
+        plasticity_ids, versions, faces, positions, indices, normals, groups, face_ids = await self.decode_pool.decode(
+            decode_refacet, index, buffer)
+
+        self.dispatcher.post(lambda: self.handler.on_refacet(filename, file_version, plasticity_ids,
+                             versions, faces, positions, indices, normals, groups, face_ids))
+
+        request = self.pending.resolve(index["message_id"], file_version)
+        if request is not None:
+            _, params = request.context
+            # NOTE: The meshes are built from the arrays already; caching them happens in the background, without
+            # holding up this or the next message. Both only read the arrays.
+            future = asyncio.get_running_loop().run_in_executor(None, self.__cache_refacet, filename, params, plasticity_ids,
+                                                                versions, faces, positions, indices, normals, groups, face_ids)
+            future.add_done_callback(self.__cached_refacet)
+
+    def __cache_refacet(self, filename, params, plasticity_ids, versions, faces, positions, indices, normals, groups, face_ids):
+        for i in range(len(plasticity_ids)):
+            self.geometry_cache.put(filename, plasticity_ids[i], versions[i], params, (
+                faces[i], positions[i], indices[i], normals[i], groups[i], face_ids[i]))
+        self.geometry_cache.flush()
+
+    def __cached_refacet(self, future):
+        if not future.cancelled() and future.exception() is not None:
+            self.report(
+                {'ERROR'}, f"Caching refaceted geometry failed: {future.exception()}")
+
+    def is_current(self, filename):
+        return filename in self.current_files
+
+    def disconnect(self, on_done=None, on_error=None):
+        if self.reconnecting and not self.connected:
+            self.report({'INFO'}, "Stopped reconnecting")
+            self.closing = True
+            self.reconnecting = False
+            self.loop.call_soon_threadsafe(self.stop_reconnecting.set)
+        elif self.connected:
             self.report({'INFO'}, "Closing WebSocket connection...")
 
-            future = run_coroutine_threadsafe(
-                self.disconnect_async(), self.loop)
-            future.result()
+            self.__run(self.disconnect_async(), on_done, on_error)
         else:
             self.report({'INFO'}, "Not connected, nothing to disconnect")
 
     async def disconnect_async(self):
+        self.closing = True
+        self.stop_reconnecting.set()
         websocket = self.websocket
         if websocket:
             await websocket.close()
@@ -527,106 +460,51 @@ class PlasticityClient:
         self.filename = None
         self.subscribed = False
         self.websocket = None
-        self.handler.on_disconnect()
+        self.current_files.clear()
+        self.coalescer.clear()
+        self.pending.cancel_all()
+        self.dispatcher.post(self.handler.on_disconnect)
         self.report({'INFO'}, "Disconnected from Plasticity server")
         return {'FINISHED'}
 
+    def __run(self, coroutine, on_done=None, on_error=None):
+        # NOTE: Returns right away. Once the request has been sent and, if it expects one, its response has
+        # arrived, on_done(result) or on_error(exception) is called on the main thread.
+        future = run_coroutine_threadsafe(
+            self.__complete(coroutine), self.loop)
+        future.add_done_callback(lambda future: self.dispatcher.post(
+            lambda: self.__callback(future, on_done, on_error)))
+        return future
+
+    async def __complete(self, coroutine):
+        result = await coroutine
+        if isinstance(result, asyncio.Future):
+            result = await result
+        return result
+
+    def __callback(self, future, on_done, on_error):
+        if future.cancelled():
+            return
+        exception = future.exception()
+        if exception is not None:
+            if on_error is not None:
+                on_error(exception)
+            elif not isinstance(exception, asyncio.TimeoutError):
+                # NOTE: Timeouts have been reported already, when they happened.
+                self.report({'ERROR'}, f"Request failed: {exception}")
+        elif on_done is not None:
+            on_done(future.result())
+
+    def __set_subscribed(self, subscribed, on_done, result):
+        self.subscribed = subscribed
+        if on_done is not None:
+            on_done(result)
+
+    def __on_sample(self, server, wire_bytes, wire_seconds, raw_bytes, inflate_seconds):
+        decision = self.compression.record(
+            server, wire_bytes, wire_seconds, raw_bytes, inflate_seconds)
+        if decision is not None:
+            self.report({'INFO'}, f"Compression {'on' if decision else 'off'} for {server} from the next connection")
+
     def report(self, level, message):
         self.handler.report(level, message)
-
-
-def decode_objects(buffer):
-    view = memoryview(buffer)
-    num_objects = int.from_bytes(view[:4], 'little')
-    offset = 4
-    objects = []
-
-    for _ in range(num_objects):
-        object_type, object_id, version_id, parent_id, material_id, flags, name, vertices, faces, normals, offset, groups, face_ids = decode_object_data(
-            view, offset)
-        objects.append({"type": object_type, "id": object_id, "version": version_id, "parent_id": parent_id, "material_id": material_id,
-                       "flags": flags, "name": name, "vertices": vertices, "faces": faces, "normals": normals, "groups": groups, "face_ids": face_ids})
-
-    return objects
-
-
-def decode_object_data(view, offset):
-    object_type = int.from_bytes(view[offset:offset + 4], 'little')
-    offset += 4
-
-    object_id = int.from_bytes(view[offset:offset + 4], 'little')
-    offset += 4
-
-    version_id = int.from_bytes(view[offset:offset + 4], 'little')
-    offset += 4
-
-    parent_id = int.from_bytes(view[offset:offset + 4], 'little', signed=True)
-    offset += 4
-
-    material_id = int.from_bytes(
-        view[offset:offset + 4], 'little', signed=True)
-    offset += 4
-
-    flags = int.from_bytes(view[offset:offset + 4], 'little')
-    offset += 4
-
-    name_length = int.from_bytes(view[offset:offset + 4], 'little')
-    offset += 4
-
-    name = view[offset:offset + name_length].tobytes().decode('utf-8')
-    offset += name_length
-
-    # Add string padding for byte alignment
-    padding = (4 - (name_length % 4)) % 4
-    offset += padding
-
-    vertices = None
-    faces = None
-    normals = None
-    groups = None
-    face_ids = None
-
-    if object_type == ObjectType.SOLID.value or object_type == ObjectType.SHEET.value:
-        num_vertices = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        vertices = np.frombuffer(
-            view[offset:offset + num_vertices * 12], dtype=np.float32)
-        offset += num_vertices * 12
-
-        num_faces = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        faces = np.frombuffer(
-            view[offset:offset + num_faces * 12], dtype=np.int32)
-        offset += num_faces * 12
-
-        num_normals = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        normals = np.frombuffer(
-            view[offset:offset + num_normals * 12], dtype=np.float32)
-        offset += num_normals * 12
-
-        num_groups = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        groups = np.frombuffer(
-            view[offset:offset + num_groups * 4], dtype=np.int32)
-        offset += num_groups * 4
-        # NOTE: As of blender 4.2, the concrete type of user attributes cannot be numpy arrays.
-        groups = groups.tolist()
-
-        num_face_ids = int.from_bytes(view[offset:offset + 4], 'little')
-        offset += 4
-
-        face_ids = np.frombuffer(
-            view[offset:offset + num_face_ids * 4], dtype=np.int32)
-        offset += num_face_ids * 4
-        # NOTE: As of blender 4.2, the concrete type of user attributes cannot be numpy arrays.
-        face_ids = face_ids.tolist()
-
-    elif object_type == ObjectType.GROUP.value:
-        pass
-
-    return object_type, object_id, version_id, parent_id, material_id, flags, name, vertices, faces, normals, offset, groups, face_ids
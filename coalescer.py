@@ -0,0 +1,96 @@
+import threading
+import time
+
+import bpy
+
+from .decoder import ObjectType
+from .scheduler import apply_scheduler
+
+
+class TransactionCoalescer:
+    # NOTE: While dragging in Plasticity the server sends a transaction every frame. Pending transactions
+    # are merged per file (last write wins per plasticity id) and applied at most max_rate times per second.
+    # Applies go through the dispatcher, so they stay in order with the lists and other messages posted there.
+    def __init__(self, handler, dispatcher, max_rate=10.0):
+        self.handler = handler
+        self.dispatcher = dispatcher
+        self.max_rate = max_rate
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.scheduled = False
+        self.last_applied = 0.0
+
+    def push(self, transaction):
+        filename = transaction["filename"]
+        with self.lock:
+            merged = self.pending.get(filename)
+            if merged is None:
+                merged = self.pending[filename] = {
+                    "filename": filename, "delete": {}, "add": {}, "update": {}}
+            merged["version"] = transaction["version"]
+
+            for plasticity_id in transaction["delete"]:
+                key = (False, plasticity_id)
+                # NOTE: An add followed by a delete cancels out. The delete itself is kept: it is a no-op
+                # if the object never reached Blender, and correct if the add replaced an existing object.
+                merged["add"].pop(key, None)
+                merged["update"].pop(key, None)
+                merged["delete"][key] = plasticity_id
+
+            for item in transaction["add"]:
+                key = object_key(item)
+                merged["update"].pop(key, None)
+                merged["add"][key] = item
+
+            for item in transaction["update"]:
+                key = object_key(item)
+                if key in merged["add"]:
+                    merged["add"][key] = item
+                else:
+                    merged["update"][key] = item
+
+            schedule = not self.scheduled
+            self.scheduled = True
+        if schedule:
+            self.dispatcher.post(self.apply)
+
+    def discard(self, filename):
+        # NOTE: A list response is a complete snapshot of the file, so it supersedes pending transactions.
+        with self.lock:
+            self.pending.pop(filename, None)
+
+    def clear(self):
+        with self.lock:
+            self.pending = {}
+
+    def apply(self):
+        self.max_rate = bpy.context.scene.prop_plasticity_live_link_rate
+
+        delay = self.last_applied + 1.0 / self.max_rate - time.monotonic()
+        if apply_scheduler.pending() > 0:
+            # NOTE: The previous update is still being applied; keep merging until it is done.
+            delay = 1.0 / self.max_rate
+        if delay > 0:
+            bpy.app.timers.register(self.__post_apply, first_interval=delay)
+            return
+
+        with self.lock:
+            pending = self.pending
+            self.pending = {}
+            self.scheduled = False
+            self.last_applied = time.monotonic()
+
+        for merged in pending.values():
+            self.handler.on_transaction({"filename": merged["filename"], "version": merged["version"],
+                                         "delete": list(merged["delete"].values()),
+                                         "add": list(merged["add"].values()),
+                                         "update": list(merged["update"].values())})
+
+    def __post_apply(self):
+        self.dispatcher.post(self.apply)
+        return None
+
+
+def object_key(item):
+    # NOTE: items and groups have overlapping ids
+    return (item.type == ObjectType.GROUP.value, item.id)
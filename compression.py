@@ -0,0 +1,110 @@
+import ipaddress
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+from .libs.websockets.extensions.permessage_deflate import \
+    ClientPerMessageDeflateFactory
+
+
+class CompressionMode(Enum):
+    OFF = "OFF"
+    FIXED = "FIXED"
+    ADAPTIVE = "ADAPTIVE"
+
+
+# NOTE: Messages smaller than this are neither inflated off the event loop nor sampled.
+min_sample_size = 64 << 10
+# NOTE: Used by the adaptive mode until a compressed message has been measured on some connection.
+default_ratio = 0.6
+default_inflate_seconds_per_byte = 1 / (300 << 20)
+
+
+class CompressionPolicy:
+    # NOTE: Decides whether to offer permessage-deflate when connecting. In adaptive mode, received messages
+    # are sampled for link throughput and, when compressed, for compression ratio and inflate cost. If the
+    # transfer time saved by compression is smaller than the time spent inflating, compression is a loss for
+    # that server, and vice versa. Deflate is negotiated in the handshake, so a changed decision applies
+    # from the next connection (or automatic reconnection) to that server.
+    def __init__(self):
+        self.mode = CompressionMode.ADAPTIVE
+        self.level = 6
+        self.decisions = {}
+        self.throughput = {}
+        self.ratio = default_ratio
+        self.inflate_seconds_per_byte = default_inflate_seconds_per_byte
+        self.inflater = None
+
+    def configure(self, mode, level):
+        self.mode = mode
+        self.level = level
+
+    def wants_compression(self, server):
+        if self.mode == CompressionMode.OFF:
+            return False
+        if self.mode == CompressionMode.FIXED:
+            return True
+        # NOTE: Over loopback, transfer is nearly free and inflating can only cost time.
+        return self.decisions.get(server, not is_loopback(server))
+
+    def connect_options(self, server):
+        if not self.wants_compression(server):
+            return {"compression": None}
+        # NOTE: The level applies to what this client sends; the server picks its own.
+        return {"compression": None, "extensions": [
+            ClientPerMessageDeflateFactory(compress_settings={"level": self.level, "memLevel": 5})]}
+
+    def record(self, server, wire_bytes, wire_seconds, raw_bytes=None, inflate_seconds=None):
+        # NOTE: raw_bytes and inflate_seconds are given for compressed messages only.
+        if wire_bytes < min_sample_size or wire_seconds <= 0:
+            return None
+        self.throughput[server] = smooth(
+            self.throughput.get(server), wire_bytes / wire_seconds)
+        if raw_bytes is not None:
+            self.ratio = smooth(self.ratio, wire_bytes / max(raw_bytes, 1))
+            self.inflate_seconds_per_byte = smooth(
+                self.inflate_seconds_per_byte, inflate_seconds / max(raw_bytes, 1))
+
+        if self.mode != CompressionMode.ADAPTIVE:
+            return None
+        decision = self.saving_per_byte(server) > self.inflate_seconds_per_byte
+        if self.decisions.get(server) != decision:
+            self.decisions[server] = decision
+            return decision
+        return None
+
+    def saving_per_byte(self, server):
+        # NOTE: Transfer time saved per uncompressed byte. Throughput is measured on whatever the wire
+        # carries, so it is the same estimate with compression on or off. Ratio and inflate cost depend
+        # on the geometry and this machine, so they are shared between servers.
+        throughput = self.throughput.get(server)
+        if throughput is None:
+            return 0.0
+        return (1 - self.ratio) / throughput
+
+    def executor(self):
+        if self.inflater is None:
+            # NOTE: zlib releases the GIL while inflating, so the event loop keeps running meanwhile.
+            self.inflater = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="plasticity-inflate")
+        return self.inflater
+
+    def shutdown(self):
+        if self.inflater is not None:
+            self.inflater.shutdown(wait=False, cancel_futures=True)
+            self.inflater = None
+
+
+def smooth(average, sample, weight=0.25):
+    if average is None:
+        return sample
+    return average + weight * (sample - average)
+
+
+def is_loopback(server):
+    host = server.rsplit(":", 1)[0].strip("[]")
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
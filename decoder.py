@@ -0,0 +1,505 @@
+# NOTE: This module must not import bpy: it is also imported by decode worker processes (see workers.py).
+import struct
+from enum import Enum
+
+import numpy as np
+
+
+class MessageType(Enum):
+    TRANSACTION_1 = 0
+    ADD_1 = 1
+    UPDATE_1 = 2
+    DELETE_1 = 3
+    MOVE_1 = 4
+    ATTRIBUTE_1 = 5
+
+    NEW_VERSION_1 = 10
+    NEW_FILE_1 = 11
+
+    LIST_ALL_1 = 20
+    LIST_SOME_1 = 21
+    LIST_VISIBLE_1 = 22
+    SUBSCRIBE_ALL_1 = 23
+    SUBSCRIBE_SOME_1 = 24
+    UNSUBSCRIBE_ALL_1 = 25
+    REFACET_SOME_1 = 26
+
+
+class ObjectType(Enum):
+    SOLID = 0
+    SHEET = 1
+    WIRE = 2
+    GROUP = 5
+    EMPTY = 6
+
+
+# NOTE: Every fixed-size header in the protocol is read with a single unpack_from. Variable-length
+# arrays are first located in an offset index (see index_*) and only then sliced, without copying,
+# out of typed word views of the whole message. Everything on the wire is 4-byte aligned.
+U32 = struct.Struct("<I")
+RESPONSE_HEADER = struct.Struct("<II")  # message_id, code
+TRANSACTION_HEADER = struct.Struct("<II")  # version, num_messages/num_items
+OBJECT_HEADER = struct.Struct("<IIIiiI")  # type, id, version, parent_id, material_id, flags
+REFACET_ITEM_HEADER = struct.Struct("<II")  # plasticity_id, version
+ITEM_HEADER = struct.Struct("<II")  # item_length, message_type
+
+# NOTE: (dtype, elements per count) for each length-prefixed array, in wire order.
+OBJECT_GEOMETRY = (
+    (np.float32, 3),  # vertices
+    (np.int32, 3),  # faces
+    (np.float32, 3),  # normals
+    (np.int32, 1),  # groups
+    (np.int32, 1),  # face_ids
+)
+REFACET_GEOMETRY = (
+    (np.int32, 1),  # faces
+    (np.float32, 1),  # positions
+    (np.int32, 1),  # indices
+    (np.float32, 1),  # normals
+    (np.int32, 1),  # groups
+    (np.int32, 1),  # face_ids
+)
+
+# NOTE: Offered as a WebSocket subprotocol. When the server selects it, the geometry of every mesh object in
+# transactions and lists is a bbox (min xyz, max xyz as float32) followed by the arrays of OBJECT_GEOMETRY,
+# except: vertices are uint16 xyz quantized over the bbox, faces are uint16 when there are at most 65536
+# vertices (uint32 otherwise) and normals are octahedral int16 pairs. Each array is zero-padded to 4 bytes.
+COMPACT_GEOMETRY = "plasticity.compact-geometry.1"
+BBOX = struct.Struct("<6f")
+COMPACT_OBJECT_GEOMETRY = (
+    (np.uint16, 3),  # vertices
+    (np.uint16, 3),  # faces, or uint32 past 65536 vertices
+    (np.int16, 2),  # normals
+    (np.int32, 1),  # groups
+    (np.int32, 1),  # face_ids
+)
+
+MESH_TYPES = (ObjectType.SOLID.value, ObjectType.SHEET.value)
+
+
+def word_views(buffer):
+    words = np.frombuffer(buffer, dtype=np.int32, count=len(buffer) // 4)
+    return {np.int32: words, np.float32: words.view(np.float32)}
+
+
+def read_string(view, offset):
+    length, = U32.unpack_from(view, offset)
+    offset += 4
+    string = str(view[offset:offset + length], 'utf-8')
+    # Add string padding for byte alignment
+    offset += length + (4 - (length % 4)) % 4
+    return string, offset
+
+
+def index_items(view, offset, num_items):
+    spans = []
+    for _ in range(num_items):
+        item_length, = U32.unpack_from(view, offset)
+        offset += 4
+        spans.append((offset, offset + item_length))
+        offset += item_length
+    return spans
+
+
+def index_arrays(view, offset, layout):
+    # NOTE: spans are (start, stop) in 4-byte words
+    unpack_from = U32.unpack_from
+    spans = []
+    for _, width in layout:
+        start = offset // 4 + 1
+        stop = start + unpack_from(view, offset)[0] * width
+        spans.append((start, stop))
+        offset = stop * 4
+    return spans, offset
+
+
+def index_compact_arrays(view, offset):
+    # NOTE: spans are (start, stop, length): start and stop in 4-byte words, length in elements
+    bbox = BBOX.unpack_from(view, offset)
+    offset += BBOX.size
+    unpack_from = U32.unpack_from
+    spans = []
+    for dtype, width in compact_layout(unpack_from(view, offset)[0]):
+        start = offset // 4 + 1
+        length = unpack_from(view, offset)[0] * width
+        stop = start + (length * np.dtype(dtype).itemsize + 3) // 4
+        spans.append((start, stop, length))
+        offset = stop * 4
+    return (bbox, spans), offset
+
+
+def compact_layout(num_vertices):
+    if num_vertices <= 65536:
+        return COMPACT_OBJECT_GEOMETRY
+    return (COMPACT_OBJECT_GEOMETRY[0], (np.uint32, 3)) + COMPACT_OBJECT_GEOMETRY[2:]
+
+
+def typed_views(words, layout):
+    return [words[dtype] for dtype, _ in layout]
+
+
+def slice_arrays(views, spans):
+    return [array[start:stop] for array, (start, stop) in zip(views, spans)]
+
+
+def index_objects(view, offset, compact=False):
+    num_objects, = U32.unpack_from(view, offset)
+    offset += 4
+
+    index = []
+    for _ in range(num_objects):
+        header = OBJECT_HEADER.unpack_from(view, offset)
+        offset += OBJECT_HEADER.size
+        name, offset = read_string(view, offset)
+
+        spans = None
+        if header[0] in MESH_TYPES:
+            if compact:
+                spans, offset = index_compact_arrays(view, offset)
+            else:
+                spans, offset = index_arrays(view, offset, OBJECT_GEOMETRY)
+
+        index.append((header, name, spans))
+    return index, offset
+
+
+def index_refacet_items(view, offset, num_items):
+    index = []
+    for _ in range(num_items):
+        plasticity_id, version = REFACET_ITEM_HEADER.unpack_from(view, offset)
+        offset += REFACET_ITEM_HEADER.size
+        spans, offset = index_arrays(view, offset, REFACET_GEOMETRY)
+        index.append((plasticity_id, version, spans))
+    return index, offset
+
+
+def index_message(view, compact=False):
+    # NOTE: The index holds only headers and spans (no arrays), so it can be built in another process and pickled back.
+    # compact tells whether COMPACT_GEOMETRY was negotiated for the connection the message came from.
+    message_type = MessageType(U32.unpack_from(view, 0)[0])
+    offset = 4
+    index = {"compact": compact}
+
+    if message_type == MessageType.TRANSACTION_1:
+        index_transaction(view, offset, index)
+
+    elif message_type == MessageType.LIST_ALL_1 or message_type == MessageType.LIST_SOME_1 or message_type == MessageType.LIST_VISIBLE_1:
+        index["message_id"], index["code"] = RESPONSE_HEADER.unpack_from(
+            view, offset)
+        offset += RESPONSE_HEADER.size
+
+        if index["code"] == 200:
+            index_transaction(view, offset, index)
+
+    elif message_type == MessageType.NEW_VERSION_1:
+        index["filename"], offset = read_string(view, offset)
+        index["version"], = U32.unpack_from(view, offset)
+
+    elif message_type == MessageType.NEW_FILE_1:
+        index["filename"], offset = read_string(view, offset)
+
+    elif message_type == MessageType.REFACET_SOME_1:
+        index["message_id"], index["code"] = RESPONSE_HEADER.unpack_from(
+            view, offset)
+        offset += RESPONSE_HEADER.size
+
+        if index["code"] == 200:
+            index["filename"], offset = read_string(view, offset)
+            index["version"], num_items = TRANSACTION_HEADER.unpack_from(
+                view, offset)
+            offset += TRANSACTION_HEADER.size
+            index["items"], offset = index_refacet_items(
+                view, offset, num_items)
+
+    return message_type, index
+
+
+def index_transaction(view, offset, index):
+    index["filename"], offset = read_string(view, offset)
+    index["version"], num_messages = TRANSACTION_HEADER.unpack_from(
+        view, offset)
+    offset += TRANSACTION_HEADER.size
+
+    index["delete"] = []
+    index["add"] = []
+    index["update"] = []
+    for start, _ in index_items(view, offset, num_messages):
+        index_message_item(view, start, index)
+
+
+def index_message_item(view, offset, index):
+    compact = index["compact"]
+    message_type = MessageType(U32.unpack_from(view, offset)[0])
+    offset += 4
+
+    if message_type == MessageType.DELETE_1:
+        num_objects, = U32.unpack_from(view, offset)
+        offset += 4
+        index["delete"].extend(struct.unpack_from(
+            f"<{num_objects}i", view, offset))
+    elif message_type == MessageType.ADD_1:
+        index["add"].extend(index_objects(view, offset, compact)[0])
+    elif message_type == MessageType.UPDATE_1:
+        index["update"].extend(index_objects(view, offset, compact)[0])
+
+
+def decode_transaction(index, words):
+    views = typed_views(words, OBJECT_GEOMETRY)
+    record = CompactObjectRecord if index["compact"] else ObjectRecord
+    return {"filename": index["filename"], "version": index["version"], "delete": index["delete"],
+            "add": decode_objects(index["add"], views, record), "update": decode_objects(index["update"], views, record)}
+
+
+def decode_objects(index, views, record=None):
+    record = record or ObjectRecord
+    return [record(header, name, spans, views) for header, name, spans in index]
+
+
+class ObjectRecord:
+    # NOTE: Only the header and the spans of the geometry are held; arrays are sliced out of the message
+    # when, and only if, the handler reads them.
+    __slots__ = ("type", "id", "version", "parent_id", "material_id",
+                 "flags", "name", "spans", "views")
+
+    def __init__(self, header, name, spans, views):
+        self.type, self.id, self.version, self.parent_id, self.material_id, self.flags = header
+        self.name = name
+        self.spans = spans
+        self.views = views
+
+    def __array(self, i):
+        if self.spans is None:
+            return None
+        start, stop = self.spans[i]
+        return self.views[i][start:stop]
+
+    @property
+    def vertices(self):
+        return self.__array(0)
+
+    @property
+    def faces(self):
+        return self.__array(1)
+
+    @property
+    def normals(self):
+        return self.__array(2)
+
+    @property
+    def groups(self):
+        return self.__array(3)
+
+    @property
+    def face_ids(self):
+        return self.__array(4)
+
+
+class CompactObjectRecord(ObjectRecord):
+    # NOTE: A record of COMPACT_GEOMETRY. Like ObjectRecord, it only holds spans: vertices, faces and normals
+    # are expanded to the float32/int32 arrays of the regular encoding the first time they are read, and
+    # kept. Objects the handler skips are never expanded.
+    __slots__ = ("bbox", "compact_spans", "expanded")
+
+    def __init__(self, header, name, spans, views):
+        self.expanded = {}
+        if spans is None:
+            super().__init__(header, name, None, views)
+            self.bbox = self.compact_spans = None
+            return
+        self.bbox, self.compact_spans = spans
+        super().__init__(header, name, [(start, stop)
+                                        for start, stop, _ in self.compact_spans], views)
+
+    def __expand(self, i):
+        if self.spans is None:
+            return None
+        array = self.expanded.get(i)
+        if array is not None:
+            return array
+
+        start, stop, length = self.compact_spans[i]
+        dtype, _ = compact_layout(self.compact_spans[0][2] // 3)[i]
+        array = self.views[0][start:stop].view(dtype)[:length]
+        if i == 0:
+            array = dequantize_positions(array, self.bbox)
+        elif i == 1:
+            array = array.view(np.int32) if array.dtype == np.uint32 else array.astype(np.int32)
+        else:
+            array = decode_octahedral(array)
+        self.expanded[i] = array
+        return array
+
+    @property
+    def vertices(self):
+        return self.__expand(0)
+
+    @property
+    def faces(self):
+        return self.__expand(1)
+
+    @property
+    def normals(self):
+        return self.__expand(2)
+
+
+def dequantize_positions(quantized, bbox):
+    lower = np.array(bbox[:3], dtype=np.float32)
+    scale = (np.array(bbox[3:], dtype=np.float32) - lower) / np.float32(65535)
+    positions = quantized.reshape(-1, 3) * scale
+    positions += lower
+    return positions.ravel()
+
+
+def decode_octahedral(encoded):
+    # NOTE: Inverse of the octahedral map. For z < 0 the square was folded over its diagonals; unfolding
+    # is x -= copysign(-z, x) (and likewise y), which is a no-op where z >= 0.
+    normals = np.empty((len(encoded) // 2, 3), dtype=np.float32)
+    np.multiply(encoded.reshape(-1, 2), np.float32(1 / 32767), out=normals[:, :2])
+    x, y, z = normals[:, 0], normals[:, 1], normals[:, 2]
+    np.subtract(1, np.abs(x), out=z)
+    z -= np.abs(y)
+    fold = np.maximum(-z, 0)
+    x -= np.copysign(fold, x)
+    y -= np.copysign(fold, y)
+    normals /= np.sqrt(np.einsum("ij,ij->i", normals, normals))[:, None]
+    return normals.ravel()
+
+
+def decode_refacet(index, words):
+    views = typed_views(words, REFACET_GEOMETRY)
+
+    plasticity_ids = [plasticity_id for plasticity_id, _, _ in index["items"]]
+    versions = [version for _, version, _ in index["items"]]
+    columns = [[] for _ in REFACET_GEOMETRY]
+    for _, _, spans in index["items"]:
+        for column, array in zip(columns, slice_arrays(views, spans)):
+            column.append(array)
+    faces, positions, indices, normals, groups, face_ids = columns
+
+    return plasticity_ids, versions, faces, positions, indices, normals, groups, face_ids
+
+
+LIST_TYPES = (MessageType.LIST_ALL_1, MessageType.LIST_SOME_1,
+              MessageType.LIST_VISIBLE_1)
+
+
+def index_object_within(view, offset, limit, compact=False):
+    # NOTE: Like one step of index_objects, but returns None if the object doesn't fit before limit yet.
+    if offset + OBJECT_HEADER.size + 4 > limit:
+        return None
+    header = OBJECT_HEADER.unpack_from(view, offset)
+    offset += OBJECT_HEADER.size
+    name_length, = U32.unpack_from(view, offset)
+    if offset + 4 + name_length > limit:
+        return None
+    name, offset = read_string(view, offset)
+
+    spans = None
+    if header[0] in MESH_TYPES:
+        if compact:
+            # NOTE: Only the vertex count can't be read before the bbox; the other counts are checked below.
+            if offset + BBOX.size + 4 > limit:
+                return None
+            layout = compact_layout(U32.unpack_from(
+                view, offset + BBOX.size)[0])
+            bbox = BBOX.unpack_from(view, offset)
+            offset += BBOX.size
+        else:
+            layout = OBJECT_GEOMETRY
+        spans = []
+        for dtype, width in layout:
+            if offset + 4 > limit:
+                return None
+            start = offset // 4 + 1
+            length = U32.unpack_from(view, offset)[0] * width
+            stop = start + (length * np.dtype(dtype).itemsize + 3) // 4
+            spans.append((start, stop, length) if compact else (start, stop))
+            offset = stop * 4
+        if offset > limit:
+            return None
+        if compact:
+            spans = (bbox, spans)
+
+    return (header, name, spans), offset
+
+
+class ListStreamDecoder:
+    # NOTE: Parses a LIST_*_1 message while it is still being received into buffer (which must already have
+    # its final size). feed(filled) returns the records completed since the previous call.
+    def __init__(self, buffer, compact=False):
+        self.view = memoryview(buffer)
+        self.views = typed_views(word_views(buffer), OBJECT_GEOMETRY)
+        self.compact = compact
+        self.record = CompactObjectRecord if compact else ObjectRecord
+        self.offset = 0
+        self.header = None
+        self.items_remaining = 0
+        self.item_end = 0
+        self.objects_remaining = 0
+        self.done = False
+
+    def feed(self, filled):
+        records = []
+        if self.header is None and not self.__parse_header(filled):
+            return records
+
+        view = self.view
+        while not self.done:
+            if self.objects_remaining > 0:
+                entry = index_object_within(
+                    view, self.offset, filled, self.compact)
+                if entry is None:
+                    break
+                (header, name, spans), self.offset = entry
+                records.append(self.record(header, name, spans, self.views))
+                self.objects_remaining -= 1
+                continue
+
+            if self.item_end:
+                self.offset = self.item_end
+                self.item_end = 0
+                self.items_remaining -= 1
+
+            if self.items_remaining == 0:
+                self.done = True
+                break
+
+            if self.offset + 12 > filled:
+                break
+            item_length, item_type = ITEM_HEADER.unpack_from(
+                view, self.offset)
+            item_end = self.offset + 4 + item_length
+            item_type = MessageType(item_type)
+            if item_type == MessageType.ADD_1 or item_type == MessageType.UPDATE_1:
+                self.objects_remaining, = U32.unpack_from(
+                    view, self.offset + 8)
+                self.offset += 12
+            elif item_end > filled:
+                break
+            self.item_end = item_end
+
+        return records
+
+    def __parse_header(self, filled):
+        view = self.view
+        if filled < 16:
+            return False
+        message_type = MessageType(U32.unpack_from(view, 0)[0])
+        message_id, code = RESPONSE_HEADER.unpack_from(view, 4)
+        header = {"message_type": message_type,
+                  "message_id": message_id, "code": code}
+        if message_type not in LIST_TYPES or code != 200:
+            self.header = header
+            self.done = True
+            return False
+
+        filename_length, = U32.unpack_from(view, 12)
+        offset = 16 + filename_length + (4 - (filename_length % 4)) % 4
+        if offset + TRANSACTION_HEADER.size > filled:
+            return False
+        header["filename"], offset = read_string(view, 12)
+        header["version"], self.items_remaining = TRANSACTION_HEADER.unpack_from(
+            view, offset)
+        self.offset = offset + TRANSACTION_HEADER.size
+        self.header = header
+        return True
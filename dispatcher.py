@@ -0,0 +1,86 @@
+import threading
+import time
+import traceback
+from collections import deque
+
+import bpy
+
+
+class MainThreadDispatcher:
+    # NOTE: Callbacks posted from any thread are run in order on Blender's main thread by one timer. Posts
+    # with the same key that are still waiting are merged: the later callback replaces the earlier one, in
+    # the earlier one's place. The timer is registered once, on the main thread, by start(); bpy.app.timers
+    # must not be touched from other threads. It polls quickly while there is a backlog and backs off to
+    # max_interval while idle, which bounds how long the first post after an idle period waits.
+    min_interval = 0.001
+    max_interval = 0.02
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = deque()
+        self.keyed = {}
+        # NOTE: Blender identifies timers by the function object, and every self.drain is a new bound method.
+        self.timer = self.drain
+        self.interval = self.min_interval
+        self.posted = 0
+        self.merged = 0
+        self.max_depth = 0
+        self.last_wait = 0.0
+        self.max_wait = 0.0
+        self.mean_wait = 0.0
+
+    def post(self, callback, key=None):
+        with self.lock:
+            now = time.monotonic()
+            self.posted += 1
+            entry = self.keyed.get(key) if key is not None else None
+            if entry is not None:
+                entry[1] = callback
+                self.merged += 1
+            else:
+                entry = [now, callback, key]
+                self.queue.append(entry)
+                if key is not None:
+                    self.keyed[key] = entry
+                self.max_depth = max(self.max_depth, len(self.queue))
+
+    def start(self):
+        if not bpy.app.timers.is_registered(self.timer):
+            bpy.app.timers.register(
+                self.timer, first_interval=self.min_interval, persistent=True)
+
+    def stop(self):
+        if bpy.app.timers.is_registered(self.timer):
+            bpy.app.timers.unregister(self.timer)
+
+    def drain(self):
+        with self.lock:
+            entries = list(self.queue)
+            self.queue.clear()
+            self.keyed.clear()
+
+        now = time.monotonic()
+        for posted_at, callback, _ in entries:
+            wait = now - posted_at
+            self.last_wait = wait
+            self.max_wait = max(self.max_wait, wait)
+            self.mean_wait = 0.9 * self.mean_wait + 0.1 * wait
+            try:
+                callback()
+            except Exception:
+                print("Dispatch failed:")
+                traceback.print_exc()
+
+        with self.lock:
+            if len(entries) > 0 or len(self.queue) > 0:
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.interval * 2, self.max_interval)
+            return self.interval
+
+    def depth(self):
+        return len(self.queue)
+
+    def stats(self):
+        return {"depth": len(self.queue), "max_depth": self.max_depth, "posted": self.posted, "merged": self.merged,
+                "last_wait": self.last_wait, "mean_wait": self.mean_wait, "max_wait": self.max_wait}
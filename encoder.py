@@ -0,0 +1,50 @@
+import struct
+
+import numpy as np
+
+from .decoder import MessageType
+
+REQUEST_HEADER = struct.Struct("<II")  # message_type, message_id
+U32 = struct.Struct("<I")
+# NOTE: relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle,
+# match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape
+REFACET_PARAMS = struct.Struct("<IffffIIffffI")
+
+
+def encode_request(message_type, message_id):
+    return REQUEST_HEADER.pack(message_type.value, message_id)
+
+
+def encode_file_ids(message_type, message_id, filename, plasticity_ids, trailer=None, trailer_values=()):
+    # NOTE: The message is sized up front and written in place: header, 4-byte aligned filename, then the
+    # ids as a single little-endian uint32 block, then an optional fixed-size trailer.
+    name = filename.encode('utf-8')
+    padded_length = (len(name) + 3) & ~3
+    ids = np.asarray(plasticity_ids, dtype="<u4")
+    trailer_size = trailer.size if trailer is not None else 0
+
+    message = bytearray(REQUEST_HEADER.size + 4 + padded_length +
+                        4 + ids.nbytes + trailer_size)
+    REQUEST_HEADER.pack_into(message, 0, message_type.value, message_id)
+    offset = REQUEST_HEADER.size
+    U32.pack_into(message, offset, len(name))
+    offset += 4
+    message[offset:offset + len(name)] = name
+    offset += padded_length
+    U32.pack_into(message, offset, len(ids))
+    offset += 4
+    message[offset:offset + ids.nbytes] = memoryview(ids).cast('B')
+    offset += ids.nbytes
+    if trailer is not None:
+        trailer.pack_into(message, offset, *trailer_values)
+    return message
+
+
+def encode_subscribe_some(message_id, filename, plasticity_ids):
+    return encode_file_ids(MessageType.SUBSCRIBE_SOME_1, message_id, filename, plasticity_ids)
+
+
+def encode_refacet_some(message_id, filename, plasticity_ids, relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle, match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape):
+    return encode_file_ids(MessageType.REFACET_SOME_1, message_id, filename, plasticity_ids, REFACET_PARAMS, (
+        relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle,
+        1 if match_topology else 0, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape.value))
@@ -1,5 +1,6 @@
 # TODO:
 # - [ ] All on_... methods should call operators (to better handle undo, to have reporting be visible in the ui, etc)
+import hashlib
 from collections import defaultdict
 from enum import Enum
 
@@ -7,6 +8,9 @@ import bpy
 import mathutils
 import numpy as np
 
+from .builder import mesh_builder, weld_vertices
+from .scheduler import apply_scheduler, call_steps
+
 
 class PlasticityIdUniquenessScope(Enum):
     ITEM = 0
@@ -28,26 +32,17 @@ class SceneHandler:
         # NOTE: items/groups have overlapping ids
         # NOTE: it turns out that caching this is unsafe with undo/redo; call __prepare() before every update
         self.files = {}
+        # NOTE: filename -> state of a list response that is being applied in batches
+        self.lists = {}
+        # NOTE: filename -> topology hash -> meshes that objects with identical geometry can share
+        self.meshes = {}
 
     def __create_mesh(self, name, verts, indices, normals, groups, face_ids):
         mesh = bpy.data.meshes.new(name)
-        mesh.vertices.add(len(verts) // 3)
-        mesh.vertices.foreach_set("co", verts)
-        mesh.loops.add(len(indices))
-        mesh.loops.foreach_set("vertex_index", indices)
-        mesh.polygons.add(len(indices) // 3)
-        mesh.polygons.foreach_set("loop_total", np.full(
-            len(indices) // 3, 3, dtype=np.int32))
-        mesh.polygons.foreach_set("loop_start", np.arange(
-            0, len(indices), 3, dtype=np.int32))
-
-        safe_loop_normals(mesh, indices, normals)
-
-        # NOTE: As of blender 4.2, the concrete type of user attributes cannot be numpy arrays.
-        assert isinstance(groups, list)
-        assert isinstance(face_ids, list)
-        mesh["groups"] = groups
-        mesh["face_ids"] = face_ids
+        mesh_builder.build(mesh, verts, indices, normals, weld=self.__weld_tolerance(),
+                           groups=groups, face_ids=face_ids)
+
+        self.__legacy_face_groups(mesh, groups, face_ids)
 
         return mesh
 
@@ -57,28 +52,12 @@ class SceneHandler:
 
         obj.name = name
 
-        mesh = obj.data
+        mesh = self.__unshare_mesh(obj)
         mesh.clear_geometry()
+        mesh_builder.build(mesh, verts, indices, normals, weld=self.__weld_tolerance(),
+                           groups=groups, face_ids=face_ids)
 
-        mesh.vertices.add(len(verts) // 3)
-        mesh.vertices.foreach_set("co", verts)
-
-        mesh.loops.add(len(indices))
-        mesh.loops.foreach_set("vertex_index", indices)
-
-        mesh.polygons.add(len(indices) // 3)
-        mesh.polygons.foreach_set("loop_start", range(0, len(indices), 3))
-        mesh.polygons.foreach_set("loop_total", [3] * (len(indices) // 3))
-
-        # NOTE: As of blender 4.2, the concrete type of user attributes cannot be numpy arrays.
-        assert isinstance(groups, list)
-        assert isinstance(face_ids, list)  
-        mesh["groups"] = groups
-        mesh["face_ids"] = face_ids
-
-        mesh.update()
-
-        safe_loop_normals(mesh, indices, normals)
+        self.__legacy_face_groups(mesh, groups, face_ids)
 
         self.update_pivot(obj)
 
@@ -86,51 +65,127 @@ class SceneHandler:
         if obj.mode == 'EDIT':
             bpy.ops.object.mode_set(mode='OBJECT')
 
-        mesh = obj.data
-        mesh.clear_geometry()
-
-        verts_array = np.array(verts).reshape(-1, 3)
-        unique_verts, inverse_indices = np.unique(
-            verts_array, axis=0, return_inverse=True)
-        new_indices = inverse_indices[indices]
+        obj["plasticity_version"] = version
 
-        mesh.vertices.add(len(unique_verts))
-        mesh.vertices.foreach_set("co", unique_verts.ravel())
+        mesh = self.__unshare_mesh(obj)
+        mesh.clear_geometry()
+        # NOTE: Refaceted meshes are always welded, exactly unless a weld distance is set.
+        mesh_builder.build(mesh, verts, indices, normals, faces=faces, weld=self.__weld_tolerance() or 0.0,
+                           groups=groups, face_ids=face_ids)
 
-        mesh.loops.add(len(indices))
-        mesh.loops.foreach_set("vertex_index", new_indices)
+        self.__legacy_face_groups(mesh, groups, face_ids)
 
-        if (len(faces) == 0):
-            mesh.polygons.add(len(new_indices) // 3)
-            mesh.polygons.foreach_set(
-                "loop_start", range(0, len(new_indices), 3))
-            mesh.polygons.foreach_set(
-                "loop_total", [3] * (len(new_indices) // 3))
+        self.update_pivot(obj)
 
-            safe_loop_normals(mesh, indices, normals)
+    def __legacy_face_groups(self, mesh, groups, face_ids):
+        # NOTE: Face groups live in mesh attributes (see builder.py); the ID property lists are only written
+        # for scripts that still read them. As of blender 4.2, those cannot be numpy arrays.
+        if bpy.context.scene.prop_plasticity_legacy_face_groups:
+            mesh["groups"] = np.asarray(groups).tolist()
+            mesh["face_ids"] = np.asarray(face_ids).tolist()
         else:
-            # Find where a new face/polygon starts (value changes in the array)
-            diffs = np.where(np.diff(faces))[0] + 1
-            # Insert the starting index for the first polygon
-            loop_start = np.insert(diffs, 0, 0)
-            # Calculate the number of vertices per polygon
-            loop_total = np.append(np.diff(loop_start), [
-                                   len(faces) - loop_start[-1]])
-            mesh.polygons.add(len(loop_start))
-            mesh.polygons.foreach_set("loop_start", loop_start)
-            mesh.polygons.foreach_set("loop_total", loop_total)
-
-            safe_loop_normals(mesh, indices, normals)
-
-
-        # NOTE: As of blender 4.2, the concrete type of user attributes cannot be numpy arrays.
-        assert isinstance(groups, list)
-        assert isinstance(face_ids, list)
-        mesh["groups"] = groups
-        mesh["face_ids"] = face_ids
+            for key in ("groups", "face_ids"):
+                if key in mesh:
+                    del mesh[key]
 
+    def __weld_tolerance(self):
+        scene = bpy.context.scene
+        if not scene.prop_plasticity_weld:
+            return None
+        return scene.prop_plasticity_weld_distance
+
+    def __shared_mesh(self, filename, name, item):
+        # NOTE: Returns (mesh, offset): a mesh with the same geometry as item, and the translation from that
+        # mesh's vertices to item's, or None if the vertices are used as is.
+        geometry_hash = geometry_key(item.vertices, item.faces, item.groups)
+        mesh, offset = self.__find_shared(
+            filename, geometry_hash, item.vertices, item.faces, item.normals)
+        if mesh is None:
+            mesh = self.__create_mesh(
+                name, item.vertices, item.faces, item.normals, item.groups, item.face_ids)
+            self.__register_shared(filename, mesh, geometry_hash)
+        return mesh, offset
+
+    def __find_shared(self, filename, geometry_hash, verts, indices, normals):
+        # NOTE: Meshes with the same topology are candidates; their positions (relative to the first vertex)
+        # and normals are compared within tolerance, since translated copies differ by float32 rounding.
+        verts = np.asarray(verts, dtype=np.float32).reshape(-1, 3)
+        if len(verts) == 0:
+            return None, None
+        loop_normals = np.asarray(normals, dtype=np.float32).reshape(-1, 3)[indices]
+        # NOTE: Welding is deterministic, so a mesh built from the same geometry has the welded vertices, in order.
+        weld = self.__weld_tolerance()
+        if weld is not None and len(self.meshes.get(filename, {}).get(geometry_hash, [])) > 0:
+            verts = weld_vertices(verts, weld)[0]
+        relative = verts - verts[0]
+
+        for mesh in self.meshes.setdefault(filename, {}).get(geometry_hash, []):
+            try:
+                if len(mesh.vertices) != len(verts) or len(mesh.loops) != len(loop_normals):
+                    continue
+                co = np.empty(len(verts) * 3, dtype=np.float32)
+                mesh.vertices.foreach_get("co", co)
+            except ReferenceError:
+                continue
+            co = co.reshape(-1, 3)
+            tolerance = geometry_tolerance * \
+                max(np.abs(co).max(), np.abs(verts).max(), 1.0)
+            if not np.allclose(co - co[0], relative, rtol=0, atol=tolerance):
+                continue
+            mesh_normals = np.empty(len(loop_normals) * 3, dtype=np.float32)
+            mesh.corner_normals.foreach_get("vector", mesh_normals)
+            if not np.allclose(mesh_normals.reshape(-1, 3), loop_normals, rtol=0, atol=1e-3):
+                continue
+            offset = (verts[0] - co[0]).tolist()
+            return mesh, offset if any(offset) else None
+        return None, None
+
+    def __register_shared(self, filename, mesh, geometry_hash):
+        mesh["plasticity_geometry_hash"] = geometry_hash
+        self.meshes.setdefault(filename, {}).setdefault(
+            geometry_hash, []).append(mesh)
+
+    def __place_shared(self, obj, offset, unit_scale):
+        if offset is not None:
+            obj.location = [o * unit_scale for o in offset]
+            obj["plasticity_shared_offset"] = True
+        elif obj.get("plasticity_shared_offset"):
+            obj.location = (0.0, 0.0, 0.0)
+            del obj["plasticity_shared_offset"]
+
+    def __update_shared(self, filename, obj, object_type, version, name, item, unit_scale):
+        geometry_hash = geometry_key(item.vertices, item.faces, item.groups)
+        mesh, offset = self.__find_shared(
+            filename, geometry_hash, item.vertices, item.faces, item.normals)
+        if mesh is None:
+            # NOTE: Nothing to share with; update in place (splitting off if shared) and offer it to others.
+            self.__update_object_and_mesh(
+                obj, object_type, version, name, item.vertices, item.faces, item.normals, item.groups, item.face_ids)
+            self.__register_shared(filename, obj.data, geometry_hash)
+            return
 
-        self.update_pivot(obj)
+        if obj.mode == 'EDIT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        obj.name = name
+        old_mesh = obj.data
+        if mesh != old_mesh:
+            obj.data = mesh
+            if old_mesh.users == 0:
+                bpy.data.meshes.remove(old_mesh)
+        self.__place_shared(obj, offset, unit_scale)
+
+    def __unshare_mesh(self, obj):
+        # NOTE: An object whose geometry diverges from the others sharing its mesh gets its own copy, which
+        # keeps materials and other mesh data. Its geometry is about to change, so it loses its hash.
+        mesh = obj.data
+        if mesh.users > 1:
+            mesh = obj.data = mesh.copy()
+        if "plasticity_geometry_hash" in mesh:
+            del mesh["plasticity_geometry_hash"]
+        if obj.get("plasticity_shared_offset"):
+            obj.location = (0.0, 0.0, 0.0)
+            del obj["plasticity_shared_offset"]
+        return mesh
 
     def update_pivot(self, obj):
         # NOTE: this doesn't work unfortunately. It seems like changing matrix_world or matrix_local
@@ -170,42 +225,54 @@ class SceneHandler:
         if group:
             bpy.data.collections.remove(group, do_unlink=True)
 
-    def __replace_objects(self, filename, inbox_collection, version, objects):
+    def __replace_objects(self, filename, inbox_collection, version, objects, orphans=None):
         scene = bpy.context.scene
         prop_plasticity_unit_scale = scene.prop_plasticity_unit_scale
+        share_meshes = scene.prop_plasticity_share_meshes
 
-        collections_to_unlink = set()
+        rebuilt = 0
+        skipped = 0
 
+        # NOTE: Yields after each object. Every step leaves the scene consistent: the object it touched is
+        # linked back into its collection before yielding, so a cancelled or interrupted apply never leaves
+        # objects detached from the inbox.
         for item in objects:
-            object_type = item['type']
-            name = item['name']
-            plasticity_id = item['id']
-            material_id = item['material_id']
-            parent_id = item['parent_id']
-            flags = item['flags']
-            verts = item['vertices']
-            faces = item['faces']
-            normals = item['normals']
-            groups = item['groups']
-            face_ids = item['face_ids']
+            object_type = item.type
+            name = item.name
+            plasticity_id = item.id
 
             if object_type == ObjectType.SOLID.value or object_type == ObjectType.SHEET.value:
-                obj = None
-                if plasticity_id not in self.files[filename][PlasticityIdUniquenessScope.ITEM]:
-                    mesh = self.__create_mesh(
-                        name, verts, faces, normals, groups, face_ids)
+                # NOTE: Geometry is decoded lazily; only read it for the objects that are actually built.
+                obj = self.files[filename][PlasticityIdUniquenessScope.ITEM].get(
+                    plasticity_id)
+                if obj is None:
+                    offset = None
+                    if share_meshes:
+                        mesh, offset = self.__shared_mesh(filename, name, item)
+                    else:
+                        mesh = self.__create_mesh(
+                            name, item.vertices, item.faces, item.normals, item.groups, item.face_ids)
                     obj = self.__add_object(filename, object_type,
                                             plasticity_id, name, mesh)
                     obj.scale = (prop_plasticity_unit_scale,
                                  prop_plasticity_unit_scale, prop_plasticity_unit_scale)
+                    self.__place_shared(obj, offset, prop_plasticity_unit_scale)
+                    rebuilt += 1
                 else:
-                    obj = self.files[filename][PlasticityIdUniquenessScope.ITEM].get(
-                        plasticity_id)
-                    if obj:
+                    # NOTE: Unchanged objects keep their mesh; only name, flags and parent are reconciled.
+                    if obj.get("plasticity_version") == item.version:
+                        if obj.name != name:
+                            obj.name = name
+                        skipped += 1
+                    elif share_meshes:
+                        self.__update_shared(
+                            filename, obj, object_type, version, name, item, prop_plasticity_unit_scale)
+                        rebuilt += 1
+                    else:
                         self.__update_object_and_mesh(
-                            obj, object_type, version, name, verts, faces, normals, groups, face_ids)
-                        for parent in obj.users_collection:
-                            parent.objects.unlink(obj)
+                            obj, object_type, version, name, item.vertices, item.faces, item.normals, item.groups, item.face_ids)
+                        rebuilt += 1
+                obj["plasticity_version"] = item.version
 
             elif object_type == ObjectType.GROUP.value:
                 if plasticity_id > 0:
@@ -219,22 +286,37 @@ class SceneHandler:
                         group_collection = self.files[filename][PlasticityIdUniquenessScope.GROUP].get(
                             plasticity_id)
                         group_collection.name = name
-                        collections_to_unlink.add(group_collection)
+                    group_collection["plasticity_version"] = item.version
+
+            self.__link_objects(filename, inbox_collection, [item], orphans)
+            yield
+            inbox_collection = self.__resume(filename)
 
+        return rebuilt, skipped
 
-        # Unlink all mirrored collections, in case they have moved. It doesn't seem like there is a more efficient way to do this??
-        for potential_parent in bpy.data.collections:
-            to_unlink = [
-                child for child in potential_parent.children if child in collections_to_unlink]
-            for child in to_unlink:
-                potential_parent.children.unlink(child)
+    def __resume(self, filename):
+        # NOTE: Called whenever a job resumes after yielding. Undo, redo, loading a file and reconnecting all
+        # forget the objects gathered by __prepare() (see forget()), which are then gathered again. Returns
+        # the inbox, which is looked up again as well.
+        if filename in self.files:
+            return self.__inbox_for_filename(filename)
+        return self.__prepare(filename)
 
+    def forget(self):
+        # NOTE: References into bpy.data do not survive undo or loading a file.
+        self.files = {}
+        self.meshes = {}
+
+    def __link_objects(self, filename, inbox_collection, objects, orphans=None):
+        # NOTE: When a list arrives in batches, an item's parent group may not have arrived yet. If orphans is
+        # given, such items are parked in the inbox (so __prepare() still finds them) and collected there.
+        # Objects and groups already in the right collection are left linked where they are.
         for item in objects:
-            object_type = item['type']
+            object_type = item.type
             uniqueness_scope = PlasticityIdUniquenessScope.ITEM if object_type != ObjectType.GROUP.value else PlasticityIdUniquenessScope.GROUP
-            plasticity_id = item['id']
-            parent_id = item['parent_id']
-            flags = item['flags']
+            plasticity_id = item.id
+            parent_id = item.parent_id
+            flags = item.flags
             is_hidden = flags & 1
             is_visible = flags & 2
             is_selectable = flags & 4
@@ -252,6 +334,9 @@ class SceneHandler:
 
             parent = inbox_collection if parent_id == 0 else self.files[filename][PlasticityIdUniquenessScope.GROUP].get(
                 parent_id)
+            if not parent and orphans is not None:
+                orphans.append(item)
+                parent = inbox_collection
             if not parent:
                 self.report(
                     {'ERROR'}, "Parent of object of type {} with id {} and parent_id {} not found".format(
@@ -259,14 +344,42 @@ class SceneHandler:
                 continue
 
             if object_type == ObjectType.GROUP.value:
-                parent.children.link(obj)
-                group_collection.hide_viewport = is_hidden or not is_visible
-                group_collection.hide_select = not is_selectable
+                if parent.children.get(obj.name) != obj:
+                    # NOTE: Groups may have moved. It doesn't seem like there is a more efficient way to find their parents??
+                    for potential_parent in bpy.data.collections:
+                        if potential_parent.children.get(obj.name) == obj:
+                            potential_parent.children.unlink(obj)
+                    parent.children.link(obj)
+                obj.hide_viewport = is_hidden or not is_visible
+                obj.hide_select = not is_selectable
             else:
-                parent.objects.link(obj)
+                users_collection = obj.users_collection
+                if len(users_collection) != 1 or users_collection[0] != parent:
+                    for collection in users_collection:
+                        collection.objects.unlink(obj)
+                    parent.objects.link(obj)
                 obj.hide_set(is_hidden or not is_visible)
                 obj.hide_select = not is_selectable
 
+    def __adopt_orphans(self, filename, inbox_collection, orphans):
+        for item in orphans:
+            uniqueness_scope = PlasticityIdUniquenessScope.ITEM if item.type != ObjectType.GROUP.value else PlasticityIdUniquenessScope.GROUP
+            obj = self.files[filename][uniqueness_scope].get(item.id)
+            parent = self.files[filename][PlasticityIdUniquenessScope.GROUP].get(
+                item.parent_id)
+            if not obj or not parent:
+                self.report(
+                    {'ERROR'}, "Parent of object of type {} with id {} and parent_id {} not found".format(
+                        item.type, item.id, item.parent_id))
+                continue
+
+            if item.type == ObjectType.GROUP.value:
+                inbox_collection.children.unlink(obj)
+                parent.children.link(obj)
+            else:
+                inbox_collection.objects.unlink(obj)
+                parent.objects.link(obj)
+
     def __inbox_for_filename(self, filename):
         plasticity_collection = bpy.data.collections.get("Plasticity")
         if not plasticity_collection:
@@ -306,6 +419,7 @@ class SceneHandler:
             PlasticityIdUniquenessScope.ITEM: {},
             PlasticityIdUniquenessScope.GROUP: {}
         }
+        meshes = {}
         for obj in objects:
             if "plasticity_id" not in obj:
                 continue
@@ -313,6 +427,11 @@ class SceneHandler:
             plasticity_id = obj.get("plasticity_id")
             if plasticity_id:
                 existing_objects[PlasticityIdUniquenessScope.ITEM][plasticity_id] = obj
+            if obj.type == 'MESH' and "plasticity_geometry_hash" in obj.data:
+                shared = meshes.setdefault(
+                    obj.data["plasticity_geometry_hash"], [])
+                if obj.data not in shared:
+                    shared.append(obj.data)
         for collection in collections:
             if "plasticity_id" not in collection:
                 continue
@@ -321,10 +440,17 @@ class SceneHandler:
                 existing_objects[PlasticityIdUniquenessScope.GROUP][plasticity_id] = collection
 
         self.files[filename] = existing_objects
+        self.meshes[filename] = meshes
 
         return inbox_collection
 
     def on_transaction(self, transaction):
+        total = len(transaction.get("add", [])) + \
+            len(transaction.get("update", []))
+        apply_scheduler.submit(self.__transaction_steps(
+            transaction), total, "Plasticity update")
+
+    def __transaction_steps(self, transaction):
         bpy.context.window_manager.plasticity_busy = False
 
         filename = transaction["filename"]
@@ -336,42 +462,97 @@ class SceneHandler:
 
         inbox_collection = self.__prepare(filename)
 
-        if "delete" in transaction:
-            for plasticity_id in transaction["delete"]:
-                self.__delete_object(filename, version, plasticity_id)
+        rebuilt = 0
+        skipped = 0
+        # NOTE: Objects are linked one at a time, so a child may be added before its new parent group.
+        orphans = []
+        try:
+            if "delete" in transaction:
+                for plasticity_id in transaction["delete"]:
+                    self.__delete_object(filename, version, plasticity_id)
+
+            if "add" in transaction:
+                added_rebuilt, added_skipped = yield from self.__replace_objects(filename, inbox_collection,
+                                                                                 version, transaction["add"], orphans)
+                rebuilt += added_rebuilt
+                skipped += added_skipped
+
+            if "update" in transaction:
+                updated_rebuilt, updated_skipped = yield from self.__replace_objects(filename, self.__resume(filename),
+                                                                                     version, transaction["update"], orphans)
+                rebuilt += updated_rebuilt
+                skipped += updated_skipped
+
+            self.__adopt_orphans(filename, self.__resume(filename), orphans)
+
+            self.report({'INFO'}, "Rebuilt " + str(rebuilt) +
+                        " objects, skipped " + str(skipped) + " unchanged")
+        finally:
+            bpy.ops.ed.undo_push(message="/Plasticity update")
 
-        if "add" in transaction:
-            self.__replace_objects(filename, inbox_collection,
-                                   version, transaction["add"])
+    def on_list(self, message):
+        filename = message["filename"]
+        version = message["version"]
 
-        if "update" in transaction:
-            self.__replace_objects(filename, inbox_collection,
-                                   version, transaction["update"])
+        self.on_list_begin(filename, version)
+        if "add" in message:
+            self.on_list_batch(filename, version, message["add"])
+        self.on_list_end(filename, version)
 
-        bpy.ops.ed.undo_push(message="/Plasticity update")
+    # NOTE: A list is applied as a begin job, one job per batch, and an end job. If the apply is cancelled
+    # part way through, the list is abandoned: later batches are ignored and deletions are not reconciled,
+    # since objects that were never reached would otherwise be removed.
+    def on_list_begin(self, filename, version):
+        apply_scheduler.submit(call_steps(
+            self.__list_begin, filename, version), 0, "Plasticity update", lambda: self.__list_cancel(filename))
 
-    def on_list(self, message):
-        bpy.context.window_manager.plasticity_busy = False
+    def on_list_batch(self, filename, version, objects):
+        apply_scheduler.submit(self.__list_batch_steps(
+            filename, version, objects), len(objects), "Plasticity update", lambda: self.__list_cancel(filename))
 
-        filename = message["filename"]
-        version = message["version"]
+    def on_list_end(self, filename, version):
+        apply_scheduler.submit(call_steps(
+            self.__list_end, filename, version), 0, "Plasticity update", lambda: self.__list_cancel(filename))
+
+    def __list_begin(self, filename, version):
+        bpy.context.window_manager.plasticity_busy = False
 
         self.report({'INFO'}, "Updating " + filename +
                     " to version " + str(version))
         bpy.ops.ed.undo_push(message="Plasticity update")
 
+        self.lists[filename] = {"items": set(), "groups": set(
+        ), "orphans": [], "rebuilt": 0, "skipped": 0}
+
+    def __list_batch_steps(self, filename, version, objects):
+        state = self.lists.get(filename)
+        if state is None:
+            return
         inbox_collection = self.__prepare(filename)
 
-        all_items = set()
-        all_groups = set()
-        if "add" in message:
-            for item in message["add"]:
-                if item["type"] == ObjectType.GROUP.value:
-                    all_groups.add(item["id"])
-                else:
-                    all_items.add(item["id"])
-            self.__replace_objects(filename, inbox_collection,
-                                   version, message["add"])
+        for item in objects:
+            if item.type == ObjectType.GROUP.value:
+                state["groups"].add(item.id)
+            else:
+                state["items"].add(item.id)
+        rebuilt, skipped = yield from self.__replace_objects(filename, inbox_collection,
+                                                             version, objects, state["orphans"])
+        state["rebuilt"] += rebuilt
+        state["skipped"] += skipped
+
+    def __list_end(self, filename, version):
+        state = self.lists.pop(filename, None)
+        if state is None:
+            return
+        inbox_collection = self.__prepare(filename)
+
+        self.__adopt_orphans(filename, inbox_collection, state["orphans"])
+
+        self.report({'INFO'}, "Rebuilt " + str(state["rebuilt"]) +
+                    " objects, skipped " + str(state["skipped"]) + " unchanged")
+
+        all_items = state["items"]
+        all_groups = state["groups"]
 
         to_delete = []
         for plasticity_id, obj in self.files[filename][PlasticityIdUniquenessScope.ITEM].items():
@@ -389,11 +570,28 @@ class SceneHandler:
 
         bpy.ops.ed.undo_push(message="/Plasticity update")
 
+    def __list_cancel(self, filename):
+        state = self.lists.pop(filename, None)
+        if state is None:
+            return
+        # NOTE: Items whose parent never arrived stay in the inbox, where the next refresh will find them.
+        self.report({'WARNING'}, "Cancelled updating " + filename + " after " +
+                    str(state["rebuilt"] + state["skipped"]) + " objects")
+        bpy.ops.ed.undo_push(message="/Plasticity update")
+
     def on_refacet(self, filename, version, plasticity_ids, versions, faces, positions, indices, normals, groups, face_ids):
+        apply_scheduler.submit(self.__refacet_steps(filename, version, plasticity_ids, versions, faces, positions,
+                               indices, normals, groups, face_ids), len(plasticity_ids), "Plasticity refacet")
+
+    def __refacet_steps(self, filename, version, plasticity_ids, versions, faces, positions, indices, normals, groups, face_ids):
         bpy.context.window_manager.plasticity_busy = False
 
-        self.report({'INFO'}, "Refaceting " + filename +
-                    " to version " + str(version))
+        if version is None:
+            self.report({'INFO'}, "Refaceting " +
+                        filename + " from the geometry cache")
+        else:
+            self.report({'INFO'}, "Refaceting " + filename +
+                        " to version " + str(version))
         bpy.ops.ed.undo_push(message="Plasticity refacet")
 
         self.__prepare(filename)
@@ -402,29 +600,36 @@ class SceneHandler:
         prev_active_object = bpy.context.view_layer.objects.active
         prev_selected_objects = bpy.context.selected_objects
 
-        for i in range(len(plasticity_ids)):
-            plasticity_id = plasticity_ids[i]
-            version = versions[i]
-            face = faces[i] if len(faces) > 0 else None
-            position = positions[i]
-            index = indices[i]
-            normal = normals[i]
-            group = groups[i]
-            face_id = face_ids[i]
-
-            obj = self.files[filename][PlasticityIdUniquenessScope.ITEM].get(
-                plasticity_id)
-            if obj:
-                self.__update_mesh_ngons(
-                    obj, version, face, position, index, normal, group, face_id)
-
-        bpy.context.view_layer.objects.active = prev_active_object
-        for obj in prev_selected_objects:
-            obj.select_set(True)
-        if prev_obj_mode:
-            bpy.ops.object.mode_set(mode=prev_obj_mode)
-
-        bpy.ops.ed.undo_push(message="/Plasticity refacet")
+        try:
+            for i in range(len(plasticity_ids)):
+                plasticity_id = plasticity_ids[i]
+                version = versions[i]
+                face = faces[i] if len(faces) > 0 else None
+                position = positions[i]
+                index = indices[i]
+                normal = normals[i]
+                group = groups[i]
+                face_id = face_ids[i]
+
+                obj = self.files[filename][PlasticityIdUniquenessScope.ITEM].get(
+                    plasticity_id)
+                if obj:
+                    self.__update_mesh_ngons(
+                        obj, version, face, position, index, normal, group, face_id)
+                yield
+                self.__resume(filename)
+        finally:
+            # NOTE: After an undo or a file load in between steps, the previous selection may no longer exist.
+            try:
+                bpy.context.view_layer.objects.active = prev_active_object
+                for obj in prev_selected_objects:
+                    obj.select_set(True)
+                if prev_obj_mode:
+                    bpy.ops.object.mode_set(mode=prev_obj_mode)
+            except (ReferenceError, RuntimeError):
+                pass
+
+            bpy.ops.ed.undo_push(message="/Plasticity refacet")
 
     def on_new_version(self, filename, version):
         self.report({'INFO'}, "New version of " +
@@ -433,29 +638,43 @@ class SceneHandler:
     def on_new_file(self, filename):
         self.report({'INFO'}, "New file available: " + filename)
 
+    def on_timeout(self, message_type, message_id):
+        bpy.context.window_manager.plasticity_busy = False
+
+        self.report({'ERROR'}, "Gave up waiting for a response to " +
+                    message_type.name + " " + str(message_id))
+
     def on_connect(self):
         bpy.context.window_manager.plasticity_busy = False
 
-        self.files = {}
+        self.__forget_after_apply()
 
     def on_disconnect(self):
         bpy.context.window_manager.plasticity_busy = False
 
-        self.files = {}
+        self.__forget_after_apply()
+
+    def __forget_after_apply(self):
+        # NOTE: Updates still being applied go on with what they gathered; forget it once they are done.
+        if apply_scheduler.running:
+            apply_scheduler.submit(call_steps(self.forget), 0, "Plasticity reset")
+        else:
+            self.forget()
 
     def report(self, level, message):
         print(message)
 
-def safe_loop_normals(mesh, indices, normals):
-    mesh.attributes.new("temp_custom_normals", 'FLOAT_VECTOR', 'CORNER')
-    mesh.attributes["temp_custom_normals"].data.foreach_set("vector", normals.reshape(-1, 3)[indices].ravel())
-
-    mesh.update()
-
-    buf = np.empty(len(mesh.loops) * 3, dtype=np.float32)
-    mesh.attributes["temp_custom_normals"].data.foreach_get("vector", buf)
+# NOTE: Relative to the largest coordinate; covers float32 rounding of copies placed by different transforms.
+geometry_tolerance = 1e-6
 
-    mesh.polygons.foreach_set("use_smooth", [True] * len(mesh.polygons))
 
-    mesh.normals_split_custom_set(buf.reshape(-1, 3))
-    mesh.attributes.remove(mesh.attributes["temp_custom_normals"])
+def geometry_key(verts, indices, groups):
+    # NOTE: Hashes topology only; positions and normals are compared by SceneHandler.__find_shared. Face ids
+    # are not part of the key: objects sharing a mesh see the face ids of the object that created it.
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(len(verts).to_bytes(8, "little"))
+    for array in (indices, groups):
+        array = np.ascontiguousarray(array, dtype=np.int32)
+        digest.update(len(array).to_bytes(8, "little"))
+        digest.update(array)
+    return digest.hexdigest()
@@ -1,8 +1,13 @@
 import math
-import random
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
-import bmesh
 import bpy
+import numpy as np
+
+from .builder import FACE_ID_ATTRIBUTE, GROUP_ATTRIBUTE, polygon_groups
 
 
 class SelectByFaceIDOperator(bpy.types.Operator):
@@ -21,44 +26,19 @@ class SelectByFaceIDOperator(bpy.types.Operator):
 
     def execute(self, context):
         obj = context.object
-        bpy.ops.object.mode_set(mode='EDIT')
-
-        mesh = obj.data
-        bm = bmesh.from_edit_mesh(mesh)
+        # NOTE: Leaving edit mode writes the edit mesh to the mesh, whose attributes are only readable in object mode.
+        bpy.ops.object.mode_set(mode='OBJECT')
 
-        groups = mesh["groups"]
-        if not groups:
+        group_index = polygon_group_index(obj)
+        if group_index is None:
+            bpy.ops.object.mode_set(mode='EDIT')
             self.report({'ERROR'}, "No groups found")
             return {'CANCELLED'}
 
-        face_ids = mesh["face_ids"]
-        if not face_ids:
-            self.report({'ERROR'}, "No face_ids found")
-            return {'CANCELLED'}
-
-        # Collect group IDs of all selected faces
-        selected_group_ids = set()
-        for face in bm.faces:
-            if face.select:
-                loop_idx = face.loops[0].index
-                for i in range(0, len(groups), 2):
-                    group_start = groups[i + 0]
-                    group_count = groups[i + 1]
-                    if loop_idx >= group_start and loop_idx < group_start + group_count:
-                        selected_group_ids.add(i)
-                        break
-
-        # Select all faces belonging to any of the selected group IDs
-        for face in bm.faces:
-            loop_start = face.loops[0].index
-            for group_id in selected_group_ids:
-                group_start = groups[group_id + 0]
-                group_count = groups[group_id + 1]
-                if loop_start >= group_start and loop_start < group_start + group_count:
-                    face.select = True
-                    break
-
-        bmesh.update_edit_mesh(mesh)
+        # Select all faces belonging to any group with a selected face
+        selected = read_polygon_select(obj.data)
+        write_selection(obj, selected | selected_groups_mask(group_index, selected))
+        bpy.ops.object.mode_set(mode='EDIT')
         return {'FINISHED'}
 
 
@@ -78,39 +58,20 @@ class SelectByFaceIDEdgeOperator(bpy.types.Operator):
 
     def execute(self, context):
         obj = context.object
-        bpy.ops.object.mode_set(mode='EDIT')
-        mesh = obj.data
-        bm = bmesh.from_edit_mesh(mesh)
-        groups = mesh["groups"]
-
-        if not groups:
+        bpy.ops.object.mode_set(mode='OBJECT')
+        group_index = polygon_group_index(obj)
+        if group_index is None:
+            bpy.ops.object.mode_set(mode='EDIT')
             self.report({'ERROR'}, "No groups found")
             return {'CANCELLED'}
 
-        face_ids = mesh["face_ids"]
-        if not face_ids:
-            self.report({'ERROR'}, "No face_ids found")
-            return {'CANCELLED'}
-
-        selected_group_ids = get_selected_group_ids(groups, bm)
-        boundary_edges = get_boundary_edges_for_group_ids(
-            groups, bm, selected_group_ids)
-
-        # Unselect the faces in selected_group_ids
-        for face in bm.faces:
-            loop_start = face.loops[0].index
-            for group_id in selected_group_ids:
-                group_start = groups[group_id + 0]
-                group_count = groups[group_id + 1]
-                if loop_start >= group_start and loop_start < group_start + group_count:
-                    face.select = False
-                    break
-
-        # Select the boundary edges
-        for edge in boundary_edges:
-            edge.select = True
-
-        bmesh.update_edit_mesh(mesh)
+        # Replace the faces of the selected groups with the boundary edges of the region they form
+        mesh = obj.data
+        selected = read_polygon_select(mesh)
+        region = selected_groups_mask(group_index, selected)
+        boundary = region_boundary_edges(mesh, region)
+        write_selection(obj, selected & ~region, boundary, region)
+        bpy.ops.object.mode_set(mode='EDIT')
         return {'FINISHED'}
 
 
@@ -151,6 +112,9 @@ class AutoMarkEdgesOperator(bpy.types.Operator):
         name="Smart Edges Marking", default=False)
     mark_sharp: bpy.props.BoolProperty(name="Mark Sharp", default=True)
     mark_seam: bpy.props.BoolProperty(name="Mark Seam", default=False)
+    sharp_angle: bpy.props.FloatProperty(
+        name="Sharp Angle", description="Smart marking only marks edges where the normals differ by more than this",
+        subtype='ANGLE', default=math.radians(5.0), min=0.0, max=math.pi)
 
     @classmethod
     def poll(cls, context):
@@ -161,161 +125,414 @@ class AutoMarkEdgesOperator(bpy.types.Operator):
         )
 
     def execute(self, context):
-        prev_obj_mode = bpy.context.object.mode
-
         if context.mode == 'EDIT_MESH':
             obj = context.active_object
             mesh = obj.data
-            bm = bmesh.from_edit_mesh(mesh)
-            groups = mesh["groups"]
-            selected_group_ids = get_selected_group_ids(groups, bm)
-            if len(selected_group_ids) == 0:
-                bpy.ops.object.mode_set(mode='OBJECT')
-                self.mark_sharp_edges(obj, groups)
+            bpy.ops.object.mode_set(mode='OBJECT')
+            group_index = polygon_group_index(obj)
+            if group_index is None:
                 bpy.ops.object.mode_set(mode='EDIT')
+                self.report({'ERROR'}, "No groups found")
+                return {'CANCELLED'}
+            selected_group_ids = get_selected_group_ids(group_index, mesh)
+            if len(selected_group_ids) == 0:
+                self.mark_sharp_edges(obj, group_index)
             else:
-                self.mark_edges_for_selected_faces(context, selected_group_ids)
-        else:
-            for obj in context.selected_objects:
-                if obj.type != 'MESH':
-                    continue
-                if not "plasticity_id" in obj.keys():
-                    continue
-
-                mesh = obj.data
-                bpy.ops.object.mode_set(mode='OBJECT')
-
-                if "plasticity_id" not in obj.keys():
-                    self.report(
-                        {'ERROR'}, "Object doesn't have a plasticity_id attribute.")
-                    return {'CANCELLED'}
+                self.mark_edges_for_selected_faces(
+                    context, group_index, selected_group_ids)
+            bpy.ops.object.mode_set(mode='EDIT')
+            return {'FINISHED'}
+
+        # NOTE: Edge flags are written straight to the meshes, so no mode switch is needed in object mode.
+        prev_obj_mode = context.object.mode if context.object else 'OBJECT'
+        if prev_obj_mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
 
-                groups = mesh["groups"]
-                self.mark_sharp_edges(obj, groups)
+        objects = [obj for obj in context.selected_objects
+                   if obj.type == 'MESH' and "plasticity_id" in obj.keys()]
+        count = edge_mark_batch.run(
+            objects, self.mark_sharp, self.mark_seam, self.mark_smart, self.sharp_angle)
+        stats = edge_mark_batch.stats()
+        self.report({'INFO'}, f"Marked edges of {count} meshes in {round(sum(stats.values()), 1)} ms (" +
+                    ", ".join(stage + " " + str(round(stats[stage], 1)) for stage in edge_mark_batch.stages) + ")")
 
-        bpy.ops.object.mode_set(mode=prev_obj_mode)
+        if prev_obj_mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode=prev_obj_mode)
         return {'FINISHED'}
 
-    def mark_edges_for_selected_faces(self, context, selected_group_ids):
+    def mark_edges_for_selected_faces(self, context, group_index, selected_group_ids):
         obj = context.active_object
         mesh = obj.data
-        bm = bmesh.from_edit_mesh(mesh)
-
-        boundary_edges = get_boundary_edges_for_group_ids(
-            mesh["groups"], bm, selected_group_ids)
+        region = np.isin(group_index, list(selected_group_ids))
+        edges = region_boundary_edges(mesh, region)
+        mark_edges(mesh, edges, self.mark_sharp, self.mark_seam)
 
-        for edge in boundary_edges:
-            if self.mark_sharp:
-                edge.smooth = False
-            if self.mark_seam:
-                edge.seam = True
-
-        bmesh.update_edit_mesh(mesh)
-
-    def mark_sharp_edges(self, obj, groups):
+    def mark_sharp_edges(self, obj, group_index):
         mesh = obj.data
-        bm = bmesh.new()
-        # mesh.calc_normals_split()
-        bm.from_mesh(mesh)
-        bm.edges.ensure_lookup_table()
-        bm.verts.ensure_lookup_table()
-        bm.faces.ensure_lookup_table()
-        loops = mesh.loops
+        edges = face_group_index.boundary(mesh, group_index)
+        if self.mark_smart:
+            edges = edges & split_normal_edges(mesh, self.sharp_angle)
+        mark_edges(mesh, edges, self.mark_sharp, self.mark_seam)
+
+
+def mark_edges(mesh, edges, sharp, seam):
+    # NOTE: Adds the masked edges to the existing sharp/seam marks. Object mode only.
+    for enabled, flag in ((sharp, "use_edge_sharp"), (seam, "use_seam")):
+        if not enabled:
+            continue
+        marked = np.empty(len(mesh.edges), dtype=bool)
+        mesh.edges.foreach_get(flag, marked)
+        marked |= edges
+        mesh.edges.foreach_set(flag, marked)
+    # NOTE: Only flags changed, so a redraw is enough; mesh.update() would also recompute the mesh.
+    mesh.update_tag()
+
+
+class FaceGroupIndex:
+    # NOTE: The face group of every polygon of a mesh, and the mask of the edges on the boundary of a group,
+    # by session_uid. Built once per mesh, from the GROUP_ATTRIBUTE attribute or, for meshes imported before
+    # it existed, from the legacy mesh["groups"] list, and kept as long as the mesh's topology and face groups
+    # are unchanged (see mesh_key). The depsgraph reports mode switches and edits of selection or edge flags as
+    # geometry updates too, so those can't be used to invalidate it.
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, mesh):
+        key, group_index = mesh_key(mesh)
+        entry = self.entries.get(mesh.session_uid)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        if group_index is None:
+            group_index = read_legacy_groups(mesh)
+        if group_index is None:
+            self.entries.pop(mesh.session_uid, None)
+        else:
+            self.entries[mesh.session_uid] = [key, group_index, None]
+        return group_index
+
+    def boundary(self, mesh, group_index=None):
+        if group_index is None:
+            group_index = self.get(mesh)
+            if group_index is None:
+                return None
+        edges = self.cached_boundary(mesh)
+        if edges is not None:
+            return edges
+        edges = group_boundary_edges(mesh, group_index)
+        self.store_boundary(mesh, edges)
+        return edges
+
+    def cached_boundary(self, mesh):
+        # NOTE: Only valid right after get(), which checks that the mesh is unchanged.
+        entry = self.entries.get(mesh.session_uid)
+        return entry[2] if entry is not None else None
+
+    def store_boundary(self, mesh, edges):
+        entry = self.entries.get(mesh.session_uid)
+        if entry is not None:
+            entry[2] = edges
+
+    def clear(self):
+        self.entries = {}
+
+
+face_group_index = FaceGroupIndex()
+
+
+@bpy.app.handlers.persistent
+def clear_face_groups(*args):
+    # NOTE: session_uids are not reused within a session; this only frees the entries of the closed file.
+    face_group_index.clear()
+
+
+class EdgeMarkBatch:
+    # NOTE: Marks the group boundaries of many meshes in object mode. Arrays are read and marks written on
+    # the main thread, since bpy is not thread safe; in between, the numpy work of all meshes runs on a
+    # thread pool, which numpy's sorting and array arithmetic (releasing the GIL) keep busy. A mesh shared
+    # by several objects is marked once.
+    stages = ("read", "compute", "write")
+
+    def __init__(self):
+        self.executor = None
+        self.last = dict.fromkeys(self.stages, 0.0)
+        self.meshes = 0
+
+    def run(self, objects, sharp, seam, smart=False, angle=0.0):
+        started = time.perf_counter()
+        timings = {}
+
+        meshes = {}
+        for obj in objects:
+            meshes.setdefault(obj.data.session_uid, obj.data)
+        marked = []
+        jobs = []
+        for mesh in meshes.values():
+            group_index = face_group_index.get(mesh)
+            if group_index is None:
+                continue
+            split_arrays = read_split_arrays(mesh) if smart else None
+            boundary = face_group_index.cached_boundary(mesh)
+            boundary_arrays = None
+            if boundary is None:
+                if split_arrays is not None:
+                    edge_index = split_arrays[1]
+                else:
+                    edge_index = np.empty(len(mesh.loops), dtype=np.int32)
+                    mesh.loops.foreach_get("edge_index", edge_index)
+                boundary_arrays = (edge_index, corner_polygons(
+                    mesh), group_index, len(mesh.edges))
+            marked.append(mesh)
+            jobs.append((boundary, boundary_arrays, split_arrays, angle))
+        started = self.__lap(timings, "read", started)
+
+        if len(jobs) > 1 and (os.cpu_count() or 1) > 1:
+            results = list(self.__executor().map(edge_mark_masks, jobs))
+        else:
+            results = [edge_mark_masks(job) for job in jobs]
+        started = self.__lap(timings, "compute", started)
+
+        for mesh, (boundary, edges) in zip(marked, results):
+            face_group_index.store_boundary(mesh, boundary)
+            mark_edges(mesh, edges, sharp, seam)
+        self.__lap(timings, "write", started)
+
+        self.last = timings
+        self.meshes = len(marked)
+        return self.meshes
+
+    def stats(self):
+        # NOTE: Milliseconds per stage of the last batch.
+        return {stage: self.last[stage] * 1000 for stage in self.stages}
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def __executor(self):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=os.cpu_count(), thread_name_prefix="plasticity-edges")
+        return self.executor
+
+    def __lap(self, timings, stage, started):
+        now = time.perf_counter()
+        timings[stage] = now - started
+        return now
+
+
+def edge_mark_masks(job):
+    # NOTE: Returns (boundary, edges to mark); the boundary is computed unless it was cached.
+    boundary, boundary_arrays, split_arrays, angle = job
+    if boundary is None:
+        boundary = group_boundary_mask(*boundary_arrays)
+    if split_arrays is None:
+        return boundary, boundary
+    return boundary, boundary & split_normal_mask(*split_arrays, angle)
+
+
+edge_mark_batch = EdgeMarkBatch()
+
+
+def polygon_group_index(obj):
+    # NOTE: None if the mesh has no face groups. Object mode only: in edit mode, mesh attributes have no data
+    # (even after update_from_editmode), so callers leave edit mode first, which also syncs the mesh.
+    return face_group_index.get(obj.data)
+
+
+def mesh_key(mesh):
+    # NOTE: Identifies the topology and face groups of a mesh: its element counts, a checksum of the edge of
+    # every corner and a checksum of the GROUP_ATTRIBUTE attribute, or the length of the legacy groups list.
+    # Reading and checksumming both arrays takes a few milliseconds on a 500k-triangle mesh. Also returns
+    # the group attribute, which is read anyway, or None for meshes without it.
+    corner_edge = read_mesh_array(mesh, ".corner_edge", len(mesh.loops), np.int32)
+    group_index = read_polygon_group_attribute(mesh)
+    groups = zlib.crc32(group_index) if group_index is not None else len(mesh.get("groups", ()))
+    key = (len(mesh.vertices), len(mesh.edges), len(mesh.loops), len(mesh.polygons),
+           zlib.crc32(corner_edge), groups)
+    return key, group_index
+
+
+def read_polygon_group_attribute(mesh):
+    attribute = mesh.attributes.get(GROUP_ATTRIBUTE)
+    if attribute is not None and attribute.domain == 'FACE' and attribute.data_type == 'INT':
+        group_index = np.empty(len(mesh.polygons), dtype=np.int32)
+        attribute.data.foreach_get("value", group_index)
+        return group_index
+    return None
+
+
+def read_legacy_groups(mesh):
+    groups = mesh.get("groups")
+    if not groups:
+        return None
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    return polygon_groups(loop_start, groups)
+
+
+def polygon_face_ids(obj):
+    # NOTE: The Plasticity face id of every polygon; see polygon_group_index.
+    mesh = obj.data
+    attribute = mesh.attributes.get(FACE_ID_ATTRIBUTE)
+    if attribute is not None and attribute.domain == 'FACE' and attribute.data_type == 'INT':
+        face_ids = np.empty(len(mesh.polygons), dtype=np.int32)
+        attribute.data.foreach_get("value", face_ids)
+        return face_ids
+    face_ids = mesh.get("face_ids")
+    group_index = polygon_group_index(obj)
+    if not face_ids or group_index is None or len(face_ids) * 2 != len(mesh.get("groups", ())):
+        return None
+    return np.asarray(face_ids, dtype=np.int32)[group_index]
+
+
+def split_normal_edges(mesh, angle):
+    return split_normal_mask(*read_split_arrays(mesh), angle)
+
+
+def read_split_arrays(mesh):
+    loop_count = len(mesh.loops)
+    vertex_index = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", vertex_index)
+    edge_index = np.empty(loop_count, dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", edge_index)
+    edge_vertices = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edge_vertices)
+    normals = np.empty(loop_count * 3, dtype=np.float32)
+    mesh.corner_normals.foreach_get("vector", normals)
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    return vertex_index, edge_index, edge_vertices.reshape(-1, 2), normals.reshape(-1, 3), loop_start
+
+
+def split_normal_mask(vertex_index, edge_index, edge_vertices, normals, loop_start, angle):
+    # NOTE: An edge between two polygons is split if, at either of its vertices, the corner normals of the
+    # two polygons differ by more than angle. Every loop holds two (edge, endpoint) corners: its own, at
+    # the start of its edge, and the next loop's, at the end. An edge end shared by exactly two corners is
+    # manifold, and the smallest and largest corner scattered onto it are those two. Returns a mask over
+    # the edges.
+    loop_count = len(vertex_index)
+    next_loop = np.arange(1, loop_count + 1, dtype=np.int32)
+    polygon_end = np.append(loop_start[1:], loop_count) - 1
+    next_loop[polygon_end] = loop_start
+
+    corners = np.concatenate((np.arange(loop_count, dtype=np.int32), next_loop))
+    edges = np.concatenate((edge_index, edge_index))
+    endpoint = vertex_index[corners] == edge_vertices[edges, 1]
+    keys = edges * 2 + endpoint
+
+    slots = len(edge_vertices) * 2
+    ends = np.flatnonzero(np.bincount(keys, minlength=slots) == 2)
+    low = np.full(slots, loop_count, dtype=np.int32)
+    np.minimum.at(low, keys, corners)
+    high = np.full(slots, -1, dtype=np.int32)
+    np.maximum.at(high, keys, corners)
+    dot = np.einsum("ij,ij->i", normals[low[ends]], normals[high[ends]])
+    split = np.zeros(len(edge_vertices), dtype=bool)
+    split[ends[dot < np.cos(angle)] // 2] = True
+    return split
+
+
+def group_boundary_edges(mesh, group_index):
+    edge_index = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("edge_index", edge_index)
+    return group_boundary_mask(edge_index, corner_polygons(mesh), group_index, len(mesh.edges))
+
+
+def group_boundary_mask(edge_index, loop_polygon, group_index, edge_count):
+    # NOTE: An edge is on the boundary of a group if an odd number of the group's polygons use it: it
+    # separates polygons of different groups, or borders an open sheet. Returns a mask over the edges.
+    keys = group_index[loop_polygon].astype(np.int64)
+    keys *= edge_count
+    keys += edge_index
+    keys, counts = np.unique(keys, return_counts=True)
+    edges = np.zeros(edge_count, dtype=bool)
+    edges[keys[(counts & 1).astype(bool)] % edge_count] = True
+    return edges
+
+
+def get_selected_group_ids(group_index, mesh):
+    return set(selected_groups(group_index, read_polygon_select(mesh)).tolist())
+
+
+def selected_groups(group_index, selected):
+    # NOTE: Polygons outside every group have group -1; they don't form a group of their own.
+    groups = np.unique(group_index[selected])
+    return groups[groups >= 0]
+
+
+def selected_groups_mask(group_index, selected):
+    # NOTE: The polygons whose group has at least one selected polygon.
+    return np.isin(group_index, selected_groups(group_index, selected))
+
+
+def read_polygon_select(mesh):
+    return read_mesh_array(mesh, ".select_poly", len(mesh.polygons), bool)
+
+
+def region_boundary_edges(mesh, polygons):
+    # NOTE: The edges used by an odd number of the given polygons, as a mask over mesh.edges.
+    loop_polygon = corner_polygons(mesh)
+    edge_index = read_mesh_array(mesh, ".corner_edge", len(mesh.loops), np.int32)
+    counts = np.bincount(
+        edge_index[polygons[loop_polygon]], minlength=len(mesh.edges))
+    return (counts & 1).astype(bool)
+
+
+def corner_polygons(mesh):
+    # NOTE: The polygon of every loop.
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+    return np.repeat(np.arange(len(loop_total), dtype=np.int32), loop_total)
+
+
+def write_selection(obj, polygons, edges=None, deselected=None):
+    # NOTE: Sets the polygon selection to the given mask and adds the given edges, like setting BMFace.select
+    # and BMEdge.select would: the edges and vertices of the deselected polygons are deselected, then those
+    # of the selected polygons and edges are selected. Other edges and vertices keep their selection.
+    # Object mode only; entering edit mode afterwards rebuilds the edit mesh from the new flags.
+    mesh = obj.data
+
+    loop_polygon = corner_polygons(mesh)
+    vertex_index = read_mesh_array(mesh, ".corner_vert", len(mesh.loops), np.int32)
+    edge_index = read_mesh_array(mesh, ".corner_edge", len(mesh.loops), np.int32)
+    edge_select = read_mesh_array(mesh, ".select_edge", len(mesh.edges), bool)
+    vertex_select = read_mesh_array(mesh, ".select_vert", len(mesh.vertices), bool)
+
+    if deselected is not None:
+        loops = deselected[loop_polygon]
+        edge_select[edge_index[loops]] = False
+        vertex_select[vertex_index[loops]] = False
+    loops = polygons[loop_polygon]
+    edge_select[edge_index[loops]] = True
+    vertex_select[vertex_index[loops]] = True
+    if edges is not None:
+        edge_select |= edges
+        edge_vertices = read_mesh_array(mesh, ".edge_verts", len(mesh.edges) * 2, np.int32)
+        vertex_select[edge_vertices.reshape(-1, 2)[edges].ravel()] = True
+
+    write_mesh_array(mesh, ".select_vert", 'POINT', vertex_select)
+    write_mesh_array(mesh, ".select_edge", 'EDGE', edge_select)
+    write_mesh_array(mesh, ".select_poly", 'FACE', polygons)
+
+
+def read_mesh_array(mesh, name, count, dtype):
+    # NOTE: Reads one of the attributes Blender stores mesh topology and selection in (.corner_vert,
+    # .select_poly, ...). Through the RNA views (loops.vertex_index, polygons.select) every element is
+    # converted one by one, which is about a hundred times slower. A missing selection attribute means
+    # nothing is selected.
+    values = np.zeros(count, dtype=dtype)
+    attribute = mesh.attributes.get(name)
+    if attribute is not None:
+        attribute.data.foreach_get("value", values)
+    return values
 
-        all_face_boundary_edges = face_boundary_edges(groups, mesh, bm)
 
-        split_edges = set()
-        if self.mark_smart:
-            for vert in bm.verts:
-                for edge in vert.link_edges:
-                    loops_for_vert_and_edge = []
-                    for face in edge.link_faces:
-                        for loop in face.loops:
-                            if loop.vert == vert:
-                                loops_for_vert_and_edge.append(loop)
-                    if len(loops_for_vert_and_edge) != 2:
-                        continue
-                    loop1, loop2 = loops_for_vert_and_edge
-                    normal1 = loops[loop1.index].normal
-                    normal2 = loops[loop2.index].normal
-                    if are_normals_different(normal1, normal2):
-                        split_edges.add(edge)
-
-        for edge in all_face_boundary_edges:
-            if self.mark_sharp:
-                if self.mark_smart and edge in split_edges:
-                    edge.smooth = False
-                elif not self.mark_smart:
-                    edge.smooth = False
-
-            if self.mark_seam:
-                if self.mark_smart and edge in split_edges:
-                    edge.seam = True
-                elif not self.mark_smart:
-                    edge.seam = True
-
-        bm.to_mesh(obj.data)
-        bm.free()
-
-
-def face_boundary_edges(groups, mesh, bm):
-    all_face_boundary_edges = set()
-    face_boundary_edges = set()
-
-    group_idx = 0
-    group_start = groups[group_idx * 2 + 0]
-    group_count = groups[group_idx * 2 + 1]
-    face_boundary_edges = set()
-
-    for poly in mesh.polygons:
-        loop_start = poly.loop_start
-        if loop_start >= group_start + group_count:
-            all_face_boundary_edges.update(face_boundary_edges)
-            group_idx += 1
-            group_start = groups[group_idx * 2 + 0]
-            group_count = groups[group_idx * 2 + 1]
-            face_boundary_edges = set()
-
-        face = bm.faces[poly.index]
-        for edge in face.edges:
-            if edge in face_boundary_edges:
-                face_boundary_edges.remove(edge)
-            else:
-                face_boundary_edges.add(edge)
-    all_face_boundary_edges.update(face_boundary_edges)
-
-    return all_face_boundary_edges
-
-
-def get_boundary_edges_for_group_ids(groups, bm, selected_group_ids):
-    boundary_edges = set()
-    for face in bm.faces:
-        loop_start = face.loops[0].index
-        for group_id in selected_group_ids:
-            group_start = groups[group_id + 0]
-            group_count = groups[group_id + 1]
-            if loop_start >= group_start and loop_start < group_start + group_count:
-                for edge in face.edges:
-                    if edge in boundary_edges:
-                        boundary_edges.remove(edge)
-                    else:
-                        boundary_edges.add(edge)
-                break
-    return boundary_edges
-
-
-def get_selected_group_ids(groups, bm):
-    selected_group_ids = set()
-    for face in bm.faces:
-        if face.select:
-            loop_idx = face.loops[0].index
-            for i in range(0, len(groups), 2):
-                group_start = groups[i + 0]
-                group_count = groups[i + 1]
-                if loop_idx >= group_start and loop_idx < group_start + group_count:
-                    selected_group_ids.add(i)
-                    break
-    return selected_group_ids
+def write_mesh_array(mesh, name, domain, values):
+    attribute = mesh.attributes.get(name)
+    if attribute is None:
+        attribute = mesh.attributes.new(name, 'BOOLEAN', domain)
+    attribute.data.foreach_set("value", values)
 
 
 class PaintPlasticityFacesOperator(bpy.types.Operator):
@@ -329,7 +546,11 @@ class PaintPlasticityFacesOperator(bpy.types.Operator):
 
     def execute(self, context):
         prev_obj_mode = bpy.context.mode
+        # NOTE: Color attributes only reach the mesh in object mode; one switch covers every selected object.
+        if prev_obj_mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
 
+        mat = face_color_material()
         for obj in context.selected_objects:
             if obj.type != 'MESH':
                 continue
@@ -337,82 +558,91 @@ class PaintPlasticityFacesOperator(bpy.types.Operator):
                 continue
             mesh = obj.data
 
-            if "plasticity_id" not in obj.keys():
-                self.report(
-                    {'ERROR'}, "Object doesn't have a plasticity_id attribute.")
-                return {'CANCELLED'}
-
-            bpy.context.view_layer.objects.active = obj
-            bpy.ops.object.mode_set(mode='OBJECT')
-
-            self.colorize_mesh(obj, mesh)
-
-            mat = bpy.data.materials.new(name="VertexColorMat")
-            mat.use_nodes = True
-            nodes = mat.node_tree.nodes
-
-            for node in nodes:
-                nodes.remove(node)
-
-            vertex_color_node = nodes.new(type='ShaderNodeVertexColor')
-            shader_node = nodes.new(type='ShaderNodeBsdfPrincipled')
-            shader_node.location = (400, 0)
-            mat.node_tree.links.new(
-                shader_node.inputs['Base Color'], vertex_color_node.outputs['Color'])
-
-            material_output = nodes.new(type='ShaderNodeOutputMaterial')
-            material_output.location = (800, 0)
-            mat.node_tree.links.new(
-                material_output.inputs['Surface'], shader_node.outputs['BSDF'])
+            if not self.colorize_mesh(obj, mesh):
+                continue
 
-            if obj.data.materials:
-                obj.data.materials[0] = mat
+            if mesh.materials:
+                mesh.materials[0] = mat
             else:
-                obj.data.materials.append(mat)
+                mesh.materials.append(mat)
 
-        bpy.ops.object.mode_set(mode=map_mode(prev_obj_mode))
+        if prev_obj_mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode=map_mode(prev_obj_mode))
 
         return {'FINISHED'}
 
     def colorize_mesh(self, obj, mesh):
-        groups = mesh["groups"]
-        face_ids = mesh["face_ids"]
-
-        if len(groups) == 0:
-            return
-        if len(face_ids) * 2 != len(groups):
-            return
-
-        if not mesh.vertex_colors:
-            mesh.vertex_colors.new()
-        color_layer = mesh.vertex_colors.active
-
-        group_idx = 0
-        group_start = groups[group_idx * 2 + 0]
-        group_count = groups[group_idx * 2 + 1]
-        face_id = face_ids[group_idx]
-        color = generate_random_color(face_id)
-
-        for poly in mesh.polygons:
-            loop_start = poly.loop_start
-            if loop_start >= group_start + group_count:
-                group_idx += 1
-                group_start = groups[group_idx * 2 + 0]
-                group_count = groups[group_idx * 2 + 1]
-                face_id = face_ids[group_idx]
-                color = generate_random_color(face_id)
-            for loop_index in range(loop_start, loop_start + poly.loop_total):
-                color_layer.data[loop_index].color = color
-
-
-def are_normals_different(normal_a, normal_b, threshold_angle_degrees=5.0):
-    threshold_cosine = math.cos(math.radians(threshold_angle_degrees))
-    dot_product = normal_a.dot(normal_b)
-    return dot_product < threshold_cosine
-
-
-def generate_random_color(face_id):
-    return (random.random(), random.random(), random.random(), 1.0)  # RGBA
+        face_ids = polygon_face_ids(obj)
+        if face_ids is None or len(face_ids) == 0:
+            return False
+
+        attribute = mesh.color_attributes.get(FACE_COLOR_ATTRIBUTE)
+        if attribute is not None and (attribute.data_type != 'BYTE_COLOR' or attribute.domain != 'CORNER'):
+            mesh.color_attributes.remove(attribute)
+            attribute = None
+        if attribute is None:
+            attribute = mesh.color_attributes.new(
+                FACE_COLOR_ATTRIBUTE, 'BYTE_COLOR', 'CORNER')
+        mesh.color_attributes.active_color = attribute
+
+        # NOTE: Polygons of one face come in a run, so colors are computed per run and repeated per corner.
+        run_start = np.flatnonzero(np.diff(face_ids, prepend=face_ids[0] - 1))
+        loop_start = np.empty(len(mesh.polygons), dtype=np.int32)
+        mesh.polygons.foreach_get("loop_start", loop_start)
+        run_corners = np.diff(loop_start[run_start], append=len(mesh.loops))
+        colors = np.repeat(face_id_colors(face_ids[run_start]), run_corners, axis=0)
+        attribute.data.foreach_set("color", colors.reshape(-1))
+        return True
+
+
+# NOTE: The color attribute and the shared material of PaintPlasticityFacesOperator.
+FACE_COLOR_ATTRIBUTE = "plasticity_face_color"
+FACE_COLOR_MATERIAL = "Plasticity Face Colors"
+
+
+def face_id_colors(face_ids, saturation=0.65, value=0.9):
+    # NOTE: RGBA per face id, the same on every run and for every object: the hue is a hash of the face id,
+    # so neighbouring ids get unrelated hues. Polygons without a face id (-1) are grey.
+    face_ids = np.asarray(face_ids, dtype=np.int64)
+    hashes = face_ids.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+    hashes ^= hashes >> np.uint64(32)
+    hue = (hashes & np.uint64(0xFFFFFF)).astype(np.float32) / np.float32(1 << 24)
+
+    # NOTE: HSV to RGB, per channel: value * (1 - saturation * clamp(|(hue * 6 + k) mod 6 - 3| - 1, 0, 1)).
+    offsets = np.array([0.0, 4.0, 2.0], dtype=np.float32)
+    k = np.mod(hue[:, None] * 6 + offsets, 6)
+    ramp = np.clip(np.abs(k - 3) - 1, 0, 1)
+    colors = np.ones((len(face_ids), 4), dtype=np.float32)
+    colors[:, :3] = value * (1 - saturation + saturation * ramp)
+    colors[face_ids < 0, :3] = 0.5
+    return colors
+
+
+def face_color_material():
+    # NOTE: One material for every painted object, created on first use and reused afterwards.
+    mat = bpy.data.materials.get(FACE_COLOR_MATERIAL)
+    if mat is not None and mat.use_nodes:
+        return mat
+    if mat is None:
+        mat = bpy.data.materials.new(name=FACE_COLOR_MATERIAL)
+    mat.use_nodes = True
+    nodes = mat.node_tree.nodes
+
+    for node in nodes:
+        nodes.remove(node)
+
+    vertex_color_node = nodes.new(type='ShaderNodeVertexColor')
+    vertex_color_node.layer_name = FACE_COLOR_ATTRIBUTE
+    shader_node = nodes.new(type='ShaderNodeBsdfPrincipled')
+    shader_node.location = (400, 0)
+    mat.node_tree.links.new(
+        shader_node.inputs['Base Color'], vertex_color_node.outputs['Color'])
+
+    material_output = nodes.new(type='ShaderNodeOutputMaterial')
+    material_output.location = (800, 0)
+    mat.node_tree.links.new(
+        material_output.inputs['Surface'], shader_node.outputs['BSDF'])
+    return mat
 
 
 mode_map = {
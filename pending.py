@@ -0,0 +1,71 @@
+import asyncio
+
+
+class PendingRequest:
+    __slots__ = ("message_type", "message_id", "context", "future", "timer")
+
+    def __init__(self, message_type, message_id, context, future):
+        self.message_type = message_type
+        self.message_id = message_id
+        self.context = context
+        self.future = future
+        self.timer = None
+
+
+class PendingRequests:
+    # NOTE: Requests awaiting a response, keyed by the message_id the server echoes back. Only touched from
+    # the client's event loop thread. A response whose request timed out, or was already answered, is stale.
+    def __init__(self, on_timeout=None):
+        self.requests = {}
+        self.on_timeout = on_timeout
+
+    def register(self, message_type, message_id, timeout, context=None):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # NOTE: Nobody has to await the future; mark its exception as retrieved so asyncio doesn't log it.
+        future.add_done_callback(
+            lambda future: future.cancelled() or future.exception())
+        request = PendingRequest(message_type, message_id, context, future)
+        request.timer = loop.call_later(timeout, self.__expire, message_id)
+        self.requests[message_id] = request
+        return request
+
+    def get(self, message_id):
+        return self.requests.get(message_id)
+
+    def resolve(self, message_id, result=None):
+        request = self.requests.pop(message_id, None)
+        if request is None:
+            return None
+        request.timer.cancel()
+        if not request.future.done():
+            request.future.set_result(result)
+        return request
+
+    def reject(self, message_id, exception):
+        request = self.requests.pop(message_id, None)
+        if request is None:
+            return None
+        request.timer.cancel()
+        if not request.future.done():
+            request.future.set_exception(exception)
+        return request
+
+    def cancel_all(self):
+        requests = self.requests
+        self.requests = {}
+        for request in requests.values():
+            request.timer.cancel()
+            request.future.cancel()
+
+    def __len__(self):
+        return len(self.requests)
+
+    def __expire(self, message_id):
+        request = self.requests.pop(message_id, None)
+        if request is None:
+            return
+        request.future.set_exception(asyncio.TimeoutError(
+            f"No response to {request.message_type.name} {message_id}"))
+        if self.on_timeout is not None:
+            self.on_timeout(request)
@@ -0,0 +1,149 @@
+import time
+import traceback
+from collections import deque
+
+import bpy
+
+
+class ApplyJob:
+    def __init__(self, steps, total, label, on_cancel):
+        self.steps = steps
+        self.total = total
+        self.label = label
+        self.on_cancel = on_cancel
+
+
+def call_steps(function, *args):
+    # NOTE: Wraps a single call as a job with no intermediate steps.
+    function(*args)
+    return
+    yield
+
+
+class ApplyScheduler:
+    # NOTE: Handler work is queued as generators that yield after each object. A modal operator advances
+    # them in order, at most budget seconds per tick, so Blender stays responsive during large updates.
+    # Cancelling closes every queued generator, so the finally blocks of the running one leave the scene
+    # consistent, and then calls each job's on_cancel.
+    def __init__(self):
+        self.jobs = deque()
+        self.running = False
+        self.done = 0
+        self.total = 0
+
+    def submit(self, steps, total=0, label="Plasticity", on_cancel=None):
+        self.jobs.append(ApplyJob(steps, total, label, on_cancel))
+        self.total += total
+        if not self.running:
+            self.start()
+
+    def pending(self):
+        return len(self.jobs)
+
+    def progress(self):
+        if self.total == 0:
+            return 0.0
+        return min(self.done / self.total, 1.0)
+
+    def start(self):
+        self.running = True
+        window_manager = bpy.context.window_manager
+        window = bpy.context.window or (
+            window_manager.windows[0] if len(window_manager.windows) > 0 else None)
+        result = set()
+        if window is not None:
+            try:
+                with bpy.context.temp_override(window=window):
+                    result = bpy.ops.wm.plasticity_apply('INVOKE_DEFAULT')
+            except Exception as e:
+                print(f"Could not start applying updates: {e}")
+                result = set()
+        if 'RUNNING_MODAL' not in result:
+            # NOTE: No window to run a modal operator in (e.g. background mode); apply everything now.
+            self.run(float("inf"))
+
+    def run(self, budget):
+        deadline = time.perf_counter() + budget
+        while len(self.jobs) > 0:
+            job = self.jobs[0]
+            try:
+                next(job.steps)
+                self.done += 1
+            except StopIteration:
+                self.jobs.popleft()
+                continue
+            except Exception:
+                self.jobs.popleft()
+                print(f"{job.label} failed:")
+                traceback.print_exc()
+                continue
+            if time.perf_counter() >= deadline:
+                return True
+        self.finish()
+        return False
+
+    def cancel(self):
+        dropped = len(self.jobs)
+        while len(self.jobs) > 0:
+            job = self.jobs.popleft()
+            try:
+                job.steps.close()
+                if job.on_cancel is not None:
+                    job.on_cancel()
+            except Exception:
+                print(f"{job.label} failed to cancel:")
+                traceback.print_exc()
+        self.finish()
+        return dropped
+
+    def finish(self):
+        self.running = False
+        self.done = 0
+        self.total = 0
+
+
+apply_scheduler = ApplyScheduler()
+
+
+class ApplyOperator(bpy.types.Operator):
+    bl_idname = "wm.plasticity_apply"
+    bl_label = "Apply Plasticity Updates"
+    bl_description = "Apply received Plasticity updates a slice at a time; press Esc to cancel"
+    bl_options = {'INTERNAL'}
+
+    def invoke(self, context, event):
+        window_manager = context.window_manager
+        self.timer = window_manager.event_timer_add(
+            0.001, window=context.window)
+        window_manager.modal_handler_add(self)
+        window_manager.progress_begin(0, 100)
+        return {'RUNNING_MODAL'}
+
+    def modal(self, context, event):
+        if event.type == 'ESC':
+            dropped = apply_scheduler.cancel()
+            self.report(
+                {'WARNING'}, f"Plasticity update cancelled, {dropped} pending update(s) dropped. Refresh to resync.")
+            self.stop(context)
+            return {'CANCELLED'}
+
+        if event.type == 'TIMER':
+            budget = context.scene.prop_plasticity_apply_budget / 1000.0
+            if not apply_scheduler.run(budget):
+                self.stop(context)
+                return {'FINISHED'}
+            context.window_manager.progress_update(
+                int(apply_scheduler.progress() * 100))
+
+        return {'PASS_THROUGH'}
+
+    def cancel(self, context):
+        # NOTE: Blender frees modal handlers without asking, e.g. on File > Open or when the window closes.
+        # Whatever was queued is dropped, so that the next update starts the scheduler again.
+        apply_scheduler.cancel()
+        self.stop(context)
+
+    def stop(self, context):
+        window_manager = context.window_manager
+        window_manager.event_timer_remove(self.timer)
+        window_manager.progress_end()
@@ -0,0 +1,185 @@
+import struct
+import threading
+import time
+
+from .decoder import LIST_TYPES, ListStreamDecoder, MessageType
+from .libs.websockets import frames
+from .libs.websockets.client import WebSocketClientProtocol
+from .libs.websockets.exceptions import PayloadTooBig, ProtocolError
+from .libs.websockets.frames import OP_BINARY, Opcode
+from .libs.websockets.legacy.framing import Frame
+
+
+class StreamedMessage(bytearray):
+    # NOTE: Set once the message has been dispatched, batch by batch, while it was being received.
+    handled = False
+
+
+class StreamingClientProtocol(WebSocketClientProtocol):
+    # NOTE: Large uncompressed binary frames are read in chunks into a preallocated StreamedMessage, and
+    # on_stream(message) is offered each one. If it returns a consumer, consumer.feed(filled) is called
+    # after every chunk; returning False stops the feeding. When permessage-deflate is negotiated,
+    # compressed frames of inflate_offload_size bytes or more are inflated on the inflater executor instead
+    # of the event loop. If on_sample is set, it is called with (wire_bytes, wire_seconds, raw_bytes,
+    # inflate_seconds) for every data frame; the last two are None if the frame was not compressed.
+    chunk_size = 4 << 20
+    inflate_offload_size = 1 << 20
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_stream = None
+        self.on_sample = None
+        self.inflater = None
+
+    async def read_frame(self, max_size):
+        if self.on_stream is None and self.on_sample is None and not self.extensions:
+            return await super().read_frame(max_size)
+
+        read = self.reader.readexactly
+        head1, head2 = struct.unpack("!BB", await read(2))
+        fin = True if head1 & 0b10000000 else False
+        rsv1 = True if head1 & 0b01000000 else False
+        rsv2 = True if head1 & 0b00100000 else False
+        rsv3 = True if head1 & 0b00010000 else False
+        try:
+            opcode = Opcode(head1 & 0b00001111)
+        except ValueError as exc:
+            raise ProtocolError("invalid opcode") from exc
+        if head2 & 0b10000000:
+            raise ProtocolError("incorrect masking")
+
+        length = head2 & 0b01111111
+        if length == 126:
+            (length,) = struct.unpack("!H", await read(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await read(8))
+        if max_size is not None and length > max_size:
+            raise PayloadTooBig(
+                f"over size limit ({length} > {max_size} bytes)")
+
+        started = time.perf_counter()
+        if self.on_stream is None or rsv1 or opcode != OP_BINARY or not fin or length < self.chunk_size:
+            data = await read(length)
+        else:
+            data = StreamedMessage(length)
+            consumer = None
+            filled = 0
+            while filled < length:
+                chunk = await read(min(self.chunk_size, length - filled))
+                data[filled:filled + len(chunk)] = chunk
+                filled += len(chunk)
+                try:
+                    if consumer is None:
+                        consumer = self.on_stream(data) or False
+                    if consumer and consumer.feed(filled) is False:
+                        consumer = False
+                except Exception:
+                    # NOTE: The message is still returned whole, and is then decoded the regular way.
+                    self.logger.error("streaming decode failed", exc_info=True)
+                    consumer = False
+        wire_seconds = time.perf_counter() - started
+
+        frame = frames.Frame(opcode, data, fin, rsv1, rsv2, rsv3)
+        raw_bytes = inflate_seconds = None
+        if self.extensions:
+            started = time.perf_counter()
+            if rsv1 and length >= self.inflate_offload_size and self.inflater is not None:
+                # NOTE: Decoding is stateful (the inflate context can be carried over between messages),
+                # so frames are still decoded one at a time, in order; only the event loop is freed.
+                frame = await self.loop.run_in_executor(self.inflater, self.__decode, frame, max_size)
+            else:
+                frame = self.__decode(frame, max_size)
+            if rsv1:
+                raw_bytes = len(frame.data)
+                inflate_seconds = time.perf_counter() - started
+        frame.check()
+
+        if self.on_sample is not None and opcode not in frames.CTRL_OPCODES:
+            self.on_sample(length, wire_seconds, raw_bytes, inflate_seconds)
+        return Frame(frame.fin, frame.opcode, frame.data, frame.rsv1, frame.rsv2, frame.rsv3)
+
+    def __decode(self, frame, max_size):
+        for extension in reversed(self.extensions):
+            frame = extension.decode(frame, max_size=max_size)
+        return frame
+
+
+class ListStream:
+    # NOTE: Hands the objects of a LIST_*_1 message to the handler in batches while the rest is still in
+    # flight. Batches are queued here and drained in order on the main thread by the client's dispatcher; deletion
+    # reconciliation (on_list_end) runs after the last batch.
+    def __init__(self, client, message):
+        self.client = client
+        self.message = message
+        self.decoder = ListStreamDecoder(message, client.compact_geometry)
+        self.lock = threading.Lock()
+        self.pending = []
+        self.scheduled = False
+        self.filename = None
+        self.version = None
+
+    def feed(self, filled):
+        records = self.decoder.feed(filled)
+        header = self.decoder.header
+        if header is None:
+            return True
+
+        if self.filename is None:
+            if header["message_type"] not in LIST_TYPES:
+                return False
+            if self.client.is_stale(header["message_id"]):
+                self.message.handled = True
+                return False
+            if header["code"] != 200:
+                self.message.handled = True
+                self.client.report(
+                    {'ERROR'}, f"List all failed with code: {header['code']}")
+                self.client.pending.reject(header["message_id"], RuntimeError(
+                    f"List all failed with code: {header['code']}"))
+                return False
+
+            self.filename = header["filename"]
+            self.version = header["version"]
+            self.client.filename = self.filename
+            self.client.coalescer.discard(self.filename)
+            self.__enqueue("begin")
+
+        if len(records) > 0:
+            self.__enqueue(records)
+
+        if self.decoder.done:
+            self.message.handled = True
+            self.__enqueue("end")
+            self.client.pending.resolve(header["message_id"], self.version)
+            if header["message_type"] == MessageType.LIST_ALL_1:
+                self.client.current_files.add(self.filename)
+            return False
+
+        return True
+
+    def __enqueue(self, step):
+        with self.lock:
+            self.pending.append(step)
+            if not self.scheduled:
+                self.scheduled = True
+                self.client.dispatcher.post(self.drain)
+
+    def drain(self):
+        with self.lock:
+            pending = self.pending
+            self.pending = []
+            self.scheduled = False
+
+        handler = self.client.handler
+        batch = []
+        for step in pending + [None]:
+            if isinstance(step, list):
+                batch.extend(step)
+                continue
+            if len(batch) > 0:
+                handler.on_list_batch(self.filename, self.version, batch)
+                batch = []
+            if step == "begin":
+                handler.on_list_begin(self.filename, self.version)
+            elif step == "end":
+                handler.on_list_end(self.filename, self.version)
@@ -0,0 +1,56 @@
+# NOTE: Times MeshBuilder.build per stage on a 665k-triangle mesh, and applying its custom normals directly
+# against the round trip through a temporary attribute the handler used before (reproduced below). Needs
+# Blender's Python, e.g. the bpy module from PyPI.
+import sys
+
+import numpy as np
+
+from benchmark import best_of
+from standin_server import surface
+
+try:
+    import bpy
+except ImportError:
+    sys.exit("bench_build.py needs bpy")
+
+from benchmark import addon_module  # noqa: E402
+
+builder = addon_module("builder")
+
+
+def attribute_normals(mesh, indices, normals):
+    mesh.attributes.new("temp_custom_normals", 'FLOAT_VECTOR', 'CORNER')
+    mesh.attributes["temp_custom_normals"].data.foreach_set("vector", normals.reshape(-1, 3)[indices].ravel())
+    mesh.update()
+    buf = np.empty(len(mesh.loops) * 3, dtype=np.float32)
+    mesh.attributes["temp_custom_normals"].data.foreach_get("vector", buf)
+    mesh.polygons.foreach_set("use_smooth", [True] * len(mesh.polygons))
+    mesh.normals_split_custom_set(buf.reshape(-1, 3))
+    mesh.attributes.remove(mesh.attributes["temp_custom_normals"])
+
+
+def direct_normals(mesh, indices, normals):
+    mesh.polygons.foreach_set("use_smooth", np.ones(len(mesh.polygons), dtype=bool))
+    mesh.normals_split_custom_set(normals.reshape(-1, 3)[indices])
+
+
+def main():
+    vertices, faces, normals, groups, face_ids = surface(578, 0)
+    mesh = bpy.data.meshes.new("bench")
+
+    def build():
+        mesh.clear_geometry()
+        builder.mesh_builder.build(mesh, vertices, faces, normals, groups=groups, face_ids=face_ids)
+        return builder.mesh_builder.last
+
+    milliseconds, stages = best_of(build, 3)
+    print(f"build {len(mesh.polygons)} triangles, {len(mesh.vertices)} vertices: {milliseconds:.0f} ms (" +
+          ", ".join(f"{stage} {seconds * 1000:.0f}" for stage, seconds in stages.items()) + ")")
+
+    old, _ = best_of(lambda: attribute_normals(mesh, faces, normals), 3)
+    new, _ = best_of(lambda: direct_normals(mesh, faces, normals), 3)
+    print(f"custom normals: through an attribute {old:.0f} ms, direct {new:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# NOTE: Measures what CompressionPolicy weighs for a large tessellated list: the deflate ratio and inflate
+# speed at several levels, and the link speed below which compression pays off. Also checks how much of
+# the main thread is left while another thread inflates, as the client does for large frames.
+import threading
+import time
+import zlib
+
+from benchmark import addon_module, best_of
+from standin_server import encode_list_all, surface
+
+compression = addon_module("compression")
+
+
+def deflate(data, level):
+    # NOTE: Raw deflate, as permessage-deflate sends it.
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+    return compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+
+
+def inflate(data):
+    return zlib.decompressobj(-15).decompress(data)
+
+
+def spin(seconds):
+    # NOTE: Pure Python work, standing in for Blender's main thread; returns iterations per second.
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        count += 1
+    return count / seconds
+
+
+def main():
+    message = encode_list_all([surface(420, seed) for seed in range(3)], False)
+    print(f"message: {len(message) / 1e6:.1f} MB")
+
+    for level in (1, 6, 9):
+        compressed = deflate(message, level)
+        ratio = len(compressed) / len(message)
+        milliseconds, _ = best_of(lambda: inflate(compressed), 3)
+        inflate_seconds = milliseconds / 1000
+        crossover = (1 - ratio) * len(message) / inflate_seconds
+
+        # NOTE: The policy should turn compression on below the crossover and off above it.
+        decisions = []
+        for speed in (crossover / 2, crossover * 2):
+            policy = compression.CompressionPolicy()
+            policy.record("server:8980", len(compressed), len(compressed) / speed, len(message), inflate_seconds)
+            decisions.append(policy.wants_compression("server:8980"))
+        assert decisions == [True, False]
+        print(f"level {level}: ratio {ratio:.2f}, inflate {len(message) / inflate_seconds / 1e6:.0f} MB/s, "
+              f"crossover {crossover * 8 / 1e9:.1f} Gbit/s")
+
+    compressed = deflate(message, 6)
+    idle = spin(0.5)
+    inflater = threading.Thread(target=lambda: [inflate(compressed) for _ in range(5)])
+    inflater.start()
+    busy = spin(0.3)
+    inflater.join()
+    print(f"main thread while inflating on another thread: {busy / idle:.0%} of idle throughput")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# NOTE: Times decoding a LIST_ALL of many small objects and a REFACET_SOME of many items: indexing the
+# message, building the records and reading every array, as the handler would.
+import struct
+
+import numpy as np
+
+from benchmark import addon_module, best_of
+from standin_server import encode_list_all, encode_string, surface
+
+decoder = addon_module("decoder")
+
+
+def encode_refacet(geometries, message_id=1, filename="file.plasticity", version=42):
+    items = []
+    for i, (vertices, faces, normals, groups, face_ids) in enumerate(geometries):
+        item = struct.pack("<II", i + 1, 7)
+        polygons = np.full(len(faces) // 3, 3, dtype=np.int32)
+        for array in (polygons, vertices, faces, normals, groups, face_ids):
+            item += struct.pack("<I", len(array)) + array.tobytes()
+        items.append(item)
+    body = encode_string(filename) + struct.pack("<II", version, len(items)) + b"".join(items)
+    return struct.pack("<III", decoder.MessageType.REFACET_SOME_1.value, message_id, 200) + body
+
+
+def decode_list(message):
+    _, index = decoder.index_message(memoryview(message))
+    transaction = decoder.decode_transaction(index, decoder.word_views(message))
+    for record in transaction["add"]:
+        record.vertices, record.faces, record.normals, record.groups, record.face_ids
+    return transaction
+
+
+def decode_refacet(message):
+    _, index = decoder.index_message(memoryview(message))
+    return decoder.decode_refacet(index, decoder.word_views(message))
+
+
+def main():
+    shapes = [surface(5, seed) for seed in range(16)]
+    list_all = encode_list_all([shapes[i % 16] for i in range(20000)], False)
+    refacet = encode_refacet([shapes[i % 16] for i in range(5000)])
+
+    milliseconds, transaction = best_of(lambda: decode_list(list_all))
+    assert len(transaction["add"]) == 20000
+    print(f"LIST_ALL 20k objects ({len(list_all) / 1e6:.1f} MB): {milliseconds:.0f} ms")
+
+    milliseconds, columns = best_of(lambda: decode_refacet(refacet))
+    assert len(columns[0]) == 5000
+    print(f"REFACET_SOME 5k items ({len(refacet) / 1e6:.1f} MB): {milliseconds:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
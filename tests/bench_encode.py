@@ -0,0 +1,56 @@
+# NOTE: Times building REFACET_SOME requests with encoder.encode_refacet_some against the bytes concatenation
+# the client used before (reproduced below), and checks that both build the same message.
+import struct
+from enum import Enum
+
+from benchmark import addon_module, best_of
+
+decoder = addon_module("decoder")
+encoder = addon_module("encoder")
+
+
+class FacetShapeType(Enum):
+    # NOTE: Mirrors client.FacetShapeType; client.py needs bpy.
+    CUT = 20501
+
+
+PARAMS = (True, 0.01, 0.35, 0.01, 0.35, True, 3, 0.0, 0.0, 0.0, 0.0, FacetShapeType.CUT)
+
+
+def concatenated_refacet_some(message_id, filename, plasticity_ids, relative_to_bbox, curve_chord_tolerance, curve_chord_angle, surface_plane_tolerance, surface_plane_angle, match_topology, max_sides, plane_angle, min_width, max_width, curve_chord_max, shape):
+    message = struct.pack("<I", decoder.MessageType.REFACET_SOME_1.value)
+    message += struct.pack("<I", message_id)
+    message += struct.pack("<I", len(filename))
+    message += struct.pack(f"<{len(filename)}s", filename.encode('utf-8'))
+    padding = (4 - (len(filename) % 4)) % 4
+    message += struct.pack(f"<{padding}x")
+    message += struct.pack("<I", len(plasticity_ids))
+    for plasticity_id in plasticity_ids:
+        message += struct.pack("<I", plasticity_id)
+    message += struct.pack("<I", relative_to_bbox)
+    message += struct.pack("<f", curve_chord_tolerance)
+    message += struct.pack("<f", curve_chord_angle)
+    message += struct.pack("<f", surface_plane_tolerance)
+    message += struct.pack("<f", surface_plane_angle)
+    message += struct.pack("<I", 1 if match_topology else 0)
+    message += struct.pack("<I", max_sides)
+    message += struct.pack("<f", plane_angle)
+    message += struct.pack("<f", min_width)
+    message += struct.pack("<f", max_width)
+    message += struct.pack("<f", curve_chord_max)
+    message += struct.pack("<I", shape.value)
+    return message
+
+
+def main():
+    for count in (10, 1000, 10000, 50000):
+        ids = list(range(1, count + 1))
+        runs = 3 if count >= 10000 else 7
+        old, old_message = best_of(lambda: concatenated_refacet_some(1, "file.plasticity", ids, *PARAMS), runs)
+        new, new_message = best_of(lambda: encoder.encode_refacet_some(1, "file.plasticity", ids, *PARAMS), runs)
+        assert bytes(new_message) == old_message
+        print(f"{count:>6} ids: {old:8.3f} ms -> {new:6.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
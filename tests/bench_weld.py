@@ -0,0 +1,57 @@
+# NOTE: Times weld_vertices against np.unique(axis=0), exactly and with a tolerance, and checks the vertex
+# counts: welding a mesh split into one vertex per corner must give back its vertices, also when every
+# point was jittered or sits on either side of a grid cell boundary, and no point may move farther than
+# the tolerance along any axis.
+import numpy as np
+
+from benchmark import addon_module, best_of
+
+builder = addon_module("builder")
+
+
+def split_grid(n):
+    # NOTE: An n x n grid of quads as triangles, with one vertex per corner: 6 n^2 points, (n + 1)^2 unique.
+    u, v = np.meshgrid(np.linspace(0, 1, n + 1), np.linspace(0, 1, n + 1))
+    grid = np.stack([u, v, 0.1 * np.sin(6 * u)], -1).reshape(-1, 3).astype(np.float32)
+    i = np.arange((n + 1) ** 2).reshape(n + 1, n + 1)[:-1, :-1].ravel()
+    corners = np.stack([i, i + 1, i + n + 1, i + 1, i + n + 2, i + n + 1], -1).ravel()
+    return grid, grid[corners]
+
+
+def check_weld(label, co, tolerance, expected):
+    milliseconds, (welded, inverse) = best_of(lambda: builder.weld_vertices(co, tolerance), 3)
+    moved = np.abs(welded[inverse] - co).max()
+    assert len(welded) == expected, f"{label}: {len(welded)} vertices, expected {expected}"
+    assert moved <= tolerance, f"{label}: a point moved {moved}, tolerance {tolerance}"
+    print(f"{label}: {milliseconds:.0f} ms, {len(welded)} vertices, moved at most {moved:.1e}")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    grid, co = split_grid(420)
+    print(f"{len(co)} split vertices, {len(grid)} unique positions")
+
+    milliseconds, unique = best_of(lambda: np.unique(co, axis=0), 3)
+    assert len(unique) == len(grid)
+    print(f"np.unique(axis=0): {milliseconds:.0f} ms")
+
+    check_weld("weld exact", co, 0.0, len(grid))
+    check_weld("weld 1e-5, jitter 1e-7", co + rng.uniform(-1e-7, 1e-7, co.shape).astype(np.float32),
+               1e-5, len(grid))
+
+    # NOTE: Every point sits next to a cell boundary of the unshifted grid, with its copy on the other side.
+    points = (rng.integers(0, 1 << 16, (100000, 3)) + 0.5).astype(np.float32) * np.float32(1e-5)
+    copies = points + rng.uniform(-1e-7, 1e-7, points.shape).astype(np.float32)
+    check_weld("weld 1e-5 across cell boundaries", np.concatenate([points, copies]), 1e-5, len(points))
+
+    # NOTE: A chain of points 0.4 tolerance apart; chained merges would move its ends by more than that.
+    chain = np.zeros((50, 3), dtype=np.float32)
+    chain[:, 0] = np.arange(50, dtype=np.float32) * np.float32(4e-6)
+    welded, inverse = builder.weld_vertices(chain, 1e-5)
+    moved = np.abs(welded[inverse] - chain).max()
+    assert moved <= 1e-5, f"chain: a point moved {moved}"
+    print(f"weld 1e-5 of a chain at 4e-6 spacing: {len(welded)} vertices, moved at most {moved:.1e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+# NOTE: Shared by the bench_*.py scripts, which are run directly (`python tests/bench_decode.py`) and print
+# their timings. The add-on's __init__ imports bpy, so modules of the add-on that don't need it are
+# imported under an empty package pointing at the add-on directory.
+import importlib
+import os
+import sys
+import time
+import types
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+package = types.ModuleType("plasticity")
+package.__path__ = [root]
+sys.modules.setdefault("plasticity", package)
+
+
+def addon_module(name):
+    return importlib.import_module("plasticity." + name)
+
+
+def best_of(function, runs=7):
+    # NOTE: The best of runs timings of function(), in milliseconds, and its last result.
+    best = float("inf")
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000, result
@@ -0,0 +1,89 @@
+# NOTE: A stand-in for the Plasticity server: encodes LIST_ALL_1 responses in the regular and the compact
+# geometry encoding, and serves them over the vendored websockets, negotiating COMPACT_GEOMETRY like the
+# real server. Only what the tests need is implemented.
+import os
+import struct
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decoder  # noqa: E402
+from libs.websockets import server  # noqa: E402
+
+
+def encode_string(value):
+    encoded = value.encode()
+    return struct.pack("<I", len(encoded)) + pad(encoded)
+
+
+def pad(data):
+    return data + b"\0" * ((4 - len(data) % 4) % 4)
+
+
+def surface(n, seed):
+    # NOTE: An n x n grid of a wavy sheet, as (vertices, faces, normals, groups, face_ids) in wire order.
+    u, v = np.meshgrid(np.linspace(0, 1, n), np.linspace(0, 1, n))
+    positions = np.stack([u * 3 + seed, v * 2, 0.2 * np.sin(3 * u) * np.cos(2 * v)], -1)
+    normals = np.stack([-0.6 * np.cos(3 * u) * np.cos(2 * v), 0.4 * np.sin(3 * u) * np.sin(2 * v),
+                        -np.ones_like(u) if seed % 2 else np.ones_like(u)], -1)
+    normals /= np.linalg.norm(normals, axis=-1, keepdims=True)
+    corner = np.arange(n * n).reshape(n, n)[:-1, :-1].ravel()
+    faces = np.stack([corner, corner + 1, corner + n, corner + 1, corner + n + 1, corner + n], -1)
+    return (positions.astype(np.float32).ravel(), faces.astype(np.int32).ravel(), normals.astype(np.float32).ravel(),
+            np.array([0, faces.size // 3], dtype=np.int32), np.array([7], dtype=np.int32))
+
+
+def encode_octahedral(normals):
+    normals = normals.reshape(-1, 3)
+    normals = normals / np.abs(normals).sum(1, keepdims=True)
+    x, y = normals[:, 0].copy(), normals[:, 1].copy()
+    below = normals[:, 2] < 0
+    x[below] = (1 - np.abs(normals[below, 1])) * np.where(normals[below, 0] >= 0, 1, -1)
+    y[below] = (1 - np.abs(normals[below, 0])) * np.where(normals[below, 1] >= 0, 1, -1)
+    return np.round(np.stack([x, y], -1) * 32767).astype(np.int16).ravel()
+
+
+def encode_object(plasticity_id, geometry, compact):
+    vertices, faces, normals, groups, face_ids = geometry
+    data = struct.pack("<IIIiiI", decoder.ObjectType.SOLID.value, plasticity_id, 7, -1, -1, 6)
+    data += encode_string(f"Solid.{plasticity_id}")
+    if not compact:
+        for array, width in ((vertices, 3), (faces, 3), (normals, 3), (groups, 1), (face_ids, 1)):
+            data += struct.pack("<I", len(array) // width) + array.tobytes()
+        return data
+
+    num_vertices = len(vertices) // 3
+    lower, upper = vertices.reshape(-1, 3).min(0), vertices.reshape(-1, 3).max(0)
+    quantized = np.round((vertices.reshape(-1, 3) - lower) / (upper - lower) * 65535).astype(np.uint16)
+    index_type = np.uint16 if num_vertices <= 65536 else np.uint32
+    data += decoder.BBOX.pack(*lower, *upper)
+    data += struct.pack("<I", num_vertices) + pad(quantized.tobytes())
+    data += struct.pack("<I", len(faces) // 3) + pad(faces.astype(index_type).tobytes())
+    data += struct.pack("<I", num_vertices) + encode_octahedral(normals).tobytes()
+    data += struct.pack("<I", len(groups)) + groups.tobytes()
+    data += struct.pack("<I", len(face_ids)) + face_ids.tobytes()
+    return data
+
+
+def encode_list_all(geometries, compact, message_id=1, filename="file.plasticity", version=42):
+    objects = b"".join(encode_object(i + 1, geometry, compact) for i, geometry in enumerate(geometries))
+    add = struct.pack("<II", decoder.MessageType.ADD_1.value, len(geometries)) + objects
+    body = encode_string(filename) + struct.pack("<II", version, 1) + struct.pack("<I", len(add)) + add
+    return struct.pack("<III", decoder.MessageType.LIST_ALL_1.value, message_id, 200) + body
+
+
+def serve(geometries, compact_geometry=True):
+    # NOTE: Sends a list of geometries to every client that connects, in the encoding it negotiated, then
+    # waits for the client to close. Use as `async with serve(...) as ws_server`, on port 0.
+    async def handler(ws, path=None):
+        await ws.send(encode_list_all(geometries, ws.subprotocol == decoder.COMPACT_GEOMETRY))
+        await ws.wait_closed()
+
+    subprotocols = [decoder.COMPACT_GEOMETRY] if compact_geometry else None
+    return server.serve(handler, "127.0.0.1", 0, subprotocols=subprotocols, max_size=None)
+
+
+def port(ws_server):
+    return ws_server.sockets[0].getsockname()[1]
@@ -0,0 +1,77 @@
+import asyncio
+import unittest
+
+import numpy as np
+
+from standin_server import (decoder, encode_list_all, port, serve,
+                            surface)
+from libs.websockets import client
+
+# NOTE: Small meshes use 16-bit indices; the last one has more than 65536 vertices and uses 32-bit indices.
+geometries = [surface(20, seed) for seed in range(4)] + [surface(260, 5)]
+
+
+def decode(message, compact):
+    _, index = decoder.index_message(memoryview(message), compact)
+    return decoder.decode_transaction(index, decoder.word_views(message))
+
+
+class CompactGeometryTest(unittest.TestCase):
+    def check(self, records, compact):
+        self.assertEqual(len(records), len(geometries))
+        for record, (vertices, faces, normals, groups, face_ids) in zip(records, geometries):
+            extent = np.ptp(vertices.reshape(-1, 3), 0).max()
+            self.assertLessEqual(np.abs(record.vertices - vertices).max(), 1e-5 * extent if compact else 0)
+            np.testing.assert_array_equal(record.faces, faces)
+            self.assertEqual(record.faces.dtype, np.int32)
+            cosines = (record.normals.reshape(-1, 3) * normals.reshape(-1, 3)).sum(1)
+            self.assertGreater(cosines.min(), np.cos(np.radians(0.05)))
+            np.testing.assert_array_equal(record.groups, groups)
+            np.testing.assert_array_equal(record.face_ids, face_ids)
+
+    def test_both_encodings_decode_to_the_same_geometry(self):
+        for compact in (False, True):
+            with self.subTest(compact=compact):
+                self.check(decode(encode_list_all(geometries, compact), compact)["add"], compact)
+
+    def test_compact_is_smaller(self):
+        self.assertLess(len(encode_list_all(geometries, True)),
+                        0.75 * len(encode_list_all(geometries, False)))
+
+    def test_compact_records_expand_lazily(self):
+        records = decode(encode_list_all(geometries, True), True)["add"]
+        self.assertEqual(records[0].expanded, {})
+        self.assertIs(records[0].vertices, records[0].vertices)
+        self.assertEqual(set(records[0].expanded), {0})
+        self.assertEqual(records[1].expanded, {})
+
+    def test_stream_decoder_matches(self):
+        for compact in (False, True):
+            with self.subTest(compact=compact):
+                message = encode_list_all(geometries, compact)
+                buffer = bytearray(len(message))
+                stream = decoder.ListStreamDecoder(buffer, compact)
+                records = []
+                for filled in list(range(0, len(message), 777)) + [len(message)]:
+                    buffer[:filled] = message[:filled]
+                    records += stream.feed(filled)
+                self.check(records, compact)
+
+    def test_negotiation_with_standin_server(self):
+        async def receive(offered, supported):
+            async with serve(geometries, supported) as ws_server:
+                subprotocols = [decoder.COMPACT_GEOMETRY] if offered else None
+                async with client.connect(f"ws://127.0.0.1:{port(ws_server)}", subprotocols=subprotocols,
+                                          max_size=None) as ws:
+                    compact = ws.subprotocol == decoder.COMPACT_GEOMETRY
+                    return compact, await ws.recv()
+
+        for offered, supported in ((True, True), (True, False), (False, True)):
+            with self.subTest(offered=offered, supported=supported):
+                compact, message = asyncio.run(receive(offered, supported))
+                self.assertEqual(compact, offered and supported)
+                self.check(decode(message, compact)["add"], compact)
+
+
+if __name__ == "__main__":
+    unittest.main()
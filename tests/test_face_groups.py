@@ -0,0 +1,74 @@
+import importlib.util
+import os
+import sys
+import unittest
+
+import numpy as np
+
+try:
+    import bpy
+except ImportError:
+    bpy = None
+
+# NOTE: Needs Blender's Python, e.g. the bpy module from PyPI: `python -m unittest discover -s tests`.
+if bpy is not None:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    spec = importlib.util.spec_from_file_location(
+        "plasticity", os.path.join(root, "__init__.py"), submodule_search_locations=[root])
+    plasticity = importlib.util.module_from_spec(spec)
+    sys.modules["plasticity"] = plasticity
+    spec.loader.exec_module(plasticity)
+    from plasticity.builder import mesh_builder
+    from plasticity.operators import edge_mark_batch, face_group_index
+
+
+def grid(n, per_group):
+    # NOTE: An n x n grid of triangles, in groups of per_group triangles.
+    u, v = np.meshgrid(np.linspace(0, 1, n + 1), np.linspace(0, 1, n + 1))
+    verts = np.stack([u, v, np.zeros_like(u)], -1).reshape(-1).astype(np.float32)
+    i = np.arange((n + 1) ** 2).reshape(n + 1, n + 1)[:-1, :-1].ravel()
+    indices = np.stack([i, i + 1, i + n + 1, i + 1, i + n + 2, i + n + 1], -1).ravel().astype(np.int32)
+    normals = np.tile(np.array([0, 0, 1], dtype=np.float32), len(verts) // 3)
+    starts = np.arange(0, len(indices), per_group * 3)
+    groups = np.stack([starts, np.minimum(per_group * 3, len(indices) - starts)], -1).ravel().astype(np.int32)
+    face_ids = np.arange(len(starts), dtype=np.int32)
+    return verts, indices, normals, groups, face_ids
+
+
+@unittest.skipIf(bpy is None, "needs bpy")
+class FaceGroupCacheTest(unittest.TestCase):
+    def setUp(self):
+        verts, indices, normals, groups, face_ids = grid(40, 40)
+        self.mesh = bpy.data.meshes.new("grid")
+        mesh_builder.build(self.mesh, verts, indices, normals, groups=groups, face_ids=face_ids)
+        self.obj = bpy.data.objects.new("grid", self.mesh)
+        bpy.context.scene.collection.objects.link(self.obj)
+        face_group_index.clear()
+
+    def tearDown(self):
+        bpy.data.objects.remove(self.obj)
+        bpy.data.meshes.remove(self.mesh)
+
+    def test_boundary_survives_marking(self):
+        edge_mark_batch.run([self.obj], True, False)
+        boundary = face_group_index.cached_boundary(self.mesh)
+        self.assertIsNotNone(boundary)
+        sharp = np.empty(len(self.mesh.edges), dtype=bool)
+        self.mesh.edges.foreach_get("use_edge_sharp", sharp)
+        np.testing.assert_array_equal(sharp, boundary)
+
+        bpy.context.view_layer.update()
+        face_group_index.get(self.mesh)
+        self.assertIs(face_group_index.cached_boundary(self.mesh), boundary)
+
+    def test_topology_change_drops_the_cache(self):
+        edge_mark_batch.run([self.obj], True, False)
+        verts, indices, normals, groups, face_ids = grid(30, 40)
+        self.mesh.clear_geometry()
+        mesh_builder.build(self.mesh, verts, indices, normals, groups=groups, face_ids=face_ids)
+        face_group_index.get(self.mesh)
+        self.assertIsNone(face_group_index.cached_boundary(self.mesh))
+
+
+if __name__ == "__main__":
+    unittest.main()
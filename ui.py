@@ -2,7 +2,10 @@ import bpy
 import math
 
 from .__init__ import plasticity_client
-from .client import FacetShapeType
+from .builder import mesh_builder
+from .client import FacetShapeType, facet_params
+from .compression import CompressionMode
+from .workers import DecodeBackend
 
 
 class ConnectButton(bpy.types.Operator):
@@ -12,11 +15,23 @@ class ConnectButton(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        return not plasticity_client.connected
+        return not plasticity_client.connected and not plasticity_client.reconnecting
 
     def execute(self, context):
         server = context.scene.prop_plasticity_server
-        plasticity_client.connect(server)
+        # NOTE: Scenes saved with the removed PROCESS backend read back as ''.
+        decode_backend = DecodeBackend.__members__.get(
+            context.scene.prop_plasticity_decode_backend, DecodeBackend.THREAD)
+        stream_lists = context.scene.prop_plasticity_stream_lists
+        auto_reconnect = context.scene.prop_plasticity_auto_reconnect
+        compression = CompressionMode[context.scene.prop_plasticity_compression]
+        compression_level = context.scene.prop_plasticity_compression_level
+        compact_geometry = context.scene.prop_plasticity_compact_geometry
+        plasticity_client.geometry_cache.configure(
+            cache_directory(context.scene), context.scene.prop_plasticity_cache_size << 20)
+        plasticity_client.connect(
+            server, decode_backend=decode_backend, stream_lists=stream_lists, auto_reconnect=auto_reconnect,
+            compression=compression, compression_level=compression_level, compact_geometry=compact_geometry)
         return {'FINISHED'}
 
 
@@ -27,7 +42,7 @@ class DisconnectButton(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        return plasticity_client.connected
+        return plasticity_client.connected or plasticity_client.reconnecting
 
     def execute(self, context):
         context.window_manager.plasticity_busy = False
@@ -42,8 +57,6 @@ class ListButton(bpy.types.Operator):
 
     @classmethod
     def poll(cls, context):
-        if context.window_manager.plasticity_busy:
-            return False
         return plasticity_client.connected
 
     def execute(self, context):
@@ -92,14 +105,10 @@ class RefacetButton(bpy.types.Operator):
     def poll(cls, context):
         if not plasticity_client.connected:
             return False
-        if context.window_manager.plasticity_busy:
-            return False
 
         return any("plasticity_id" in obj.keys() for obj in context.selected_objects)
 
     def execute(self, context):
-        context.window_manager.plasticity_busy = True
-
         curve_chord_tolerance = context.scene.prop_plasticity_facet_tolerance
         surface_plane_tolerance = context.scene.prop_plasticity_facet_tolerance
         curve_chord_angle = context.scene.prop_plasticity_facet_angle
@@ -121,33 +130,75 @@ class RefacetButton(bpy.types.Operator):
                 max_width = min_width
             curve_chord_max = max_width * math.sqrt(0.5)
 
-        plasticity_ids_by_filename = {}
+        facet_options = dict(relative_to_bbox=True,
+                             curve_chord_tolerance=curve_chord_tolerance,
+                             curve_chord_angle=curve_chord_angle,
+                             surface_plane_tolerance=surface_plane_tolerance,
+                             surface_plane_angle=surface_plane_angle,
+                             match_topology=True,
+                             max_sides=max_sides,
+                             plane_angle=plane_angle,
+                             min_width=min_width,
+                             max_width=max_width,
+                             curve_chord_max=curve_chord_max,
+                             shape=FacetShapeType.CUT)
+        params = facet_params(**facet_options)
+
+        objects_by_filename = {}
         for obj in context.selected_objects:
             if "plasticity_filename" in obj.keys():
-                if obj["plasticity_filename"] not in plasticity_ids_by_filename.keys():
-                    plasticity_ids_by_filename[obj["plasticity_filename"]] = []
-                plasticity_ids_by_filename[obj["plasticity_filename"]].append(
-                    obj["plasticity_id"])
-
-        for filename, plasticity_ids in plasticity_ids_by_filename.items():
-            plasticity_client.refacet_some(filename,
-                                           plasticity_ids,
-                                           relative_to_bbox=True,
-                                           curve_chord_tolerance=curve_chord_tolerance,
-                                           curve_chord_angle=curve_chord_angle,
-                                           surface_plane_tolerance=surface_plane_tolerance,
-                                           surface_plane_angle=surface_plane_angle,
-                                           match_topology=True,
-                                           max_sides=max_sides,
-                                           plane_angle=plane_angle,
-                                           min_width=min_width,
-                                           max_width=max_width,
-                                           curve_chord_max=curve_chord_max,
-                                           shape=FacetShapeType.CUT)
+                if obj["plasticity_filename"] not in objects_by_filename.keys():
+                    objects_by_filename[obj["plasticity_filename"]] = []
+                objects_by_filename[obj["plasticity_filename"]].append(obj)
+
+        # NOTE: Objects refaceted before with the same parameters, and unchanged since, are rebuilt from the
+        # geometry cache; only the rest is requested from the server. An object's plasticity_version only
+        # says it is unchanged while its file is current (see PlasticityClient.current_files).
+        geometry_cache = plasticity_client.geometry_cache
+        for filename, objects in objects_by_filename.items():
+            cached = [[] for _ in range(8)]
+            plasticity_ids = []
+            use_cache = plasticity_client.is_current(filename)
+            for obj in objects:
+                plasticity_id = obj["plasticity_id"]
+                version = obj.get("plasticity_version")
+                arrays = None
+                if version is not None and use_cache:
+                    arrays = geometry_cache.get(
+                        filename, plasticity_id, version, params)
+                if arrays is None:
+                    plasticity_ids.append(plasticity_id)
+                    continue
+                for column, value in zip(cached, (plasticity_id, version, *arrays)):
+                    column.append(value)
+
+            if len(cached[0]) > 0:
+                plasticity_client.handler.on_refacet(filename, None, *cached)
+            if len(plasticity_ids) > 0:
+                context.window_manager.plasticity_busy = True
+                plasticity_client.refacet_some(
+                    filename, plasticity_ids, on_error=refacet_failed, **facet_options)
+
+        stats = geometry_cache.stats()
+        self.report({'INFO'}, "Geometry cache: " + str(stats["hits"]) +
+                    " hits, " + str(stats["misses"]) + " misses")
 
         return {'FINISHED'}
 
 
+def refacet_failed(exception):
+    bpy.context.window_manager.plasticity_busy = False
+    plasticity_client.report({'ERROR'}, f"Refacet failed: {exception}")
+
+
+def cache_directory(scene):
+    if scene.prop_plasticity_cache_size == 0:
+        return None
+    if scene.prop_plasticity_cache_directory:
+        return bpy.path.abspath(scene.prop_plasticity_cache_directory)
+    return bpy.utils.user_resource('DATAFILES', path="plasticity_cache", create=True)
+
+
 class PlasticityPanel(bpy.types.Panel):
     bl_idname = "OBJECT_PT_plasticity_panel"
     bl_label = "Plasticity"
@@ -163,15 +214,38 @@ class PlasticityPanel(bpy.types.Panel):
             disconnect_button = layout.operator(
                 "wm.disconnect_button", text="Disconnect")
             layout.label(text="Connected to " + plasticity_client.server)
+        elif plasticity_client.reconnecting:
+            layout.operator("wm.disconnect_button",
+                            text="Stop reconnecting")
+            layout.label(text="Reconnecting to " + plasticity_client.server)
         else:
             box = layout.box()
             connect_button = box.operator(
                 "wm.connect_button", text="Connect")
             box.prop(scene, "prop_plasticity_server", text="Server")
+            box.prop(scene, "prop_plasticity_decode_backend", text="Decode")
+            box.prop(scene, "prop_plasticity_stream_lists")
+            box.prop(scene, "prop_plasticity_auto_reconnect")
+            box.prop(scene, "prop_plasticity_compression", text="Compression")
+            if scene.prop_plasticity_compression != "OFF":
+                box.prop(scene, "prop_plasticity_compression_level")
+            box.prop(scene, "prop_plasticity_compact_geometry")
+            box.prop(scene, "prop_plasticity_cache_directory", text="Cache")
+            box.prop(scene, "prop_plasticity_cache_size", text="Cache MB")
 
         if plasticity_client.connected:
             if plasticity_client.filename:
                 layout.label(text="Filename: " + plasticity_client.filename)
+            layout.label(text="Compression: " +
+                         ("deflate" if plasticity_client.compressed else "off"))
+            layout.label(text="Geometry: " +
+                         ("compact" if plasticity_client.compact_geometry else "regular"))
+            if len(plasticity_client.pending) > 0:
+                layout.label(text="Awaiting " +
+                             str(len(plasticity_client.pending)) + " response(s)")
+            dispatch = plasticity_client.dispatcher.stats()
+            layout.label(text="Queued: " + str(dispatch["depth"]) + ", avg wait " +
+                         str(round(dispatch["mean_wait"] * 1000, 1)) + " ms")
 
             layout.separator()
 
@@ -181,12 +255,27 @@ class PlasticityPanel(bpy.types.Panel):
             box.operator("wm.list", text="Refresh")
             box.prop(scene, "prop_plasticity_unit_scale",
                      text="Scale", slider=True)
+            box.prop(scene, "prop_plasticity_share_meshes",
+                     text="Share identical meshes")
+            box.prop(scene, "prop_plasticity_legacy_face_groups")
+            box.prop(scene, "prop_plasticity_weld")
+            if scene.prop_plasticity_weld:
+                box.prop(scene, "prop_plasticity_weld_distance",
+                         text="Distance")
 
             layout.separator()
             if not plasticity_client.subscribed:
                 layout.operator("wm.subscribe_all", text="Live link")
             else:
                 layout.operator("wm.unsubscribe_all", text="Disable live link")
+            layout.prop(scene, "prop_plasticity_live_link_rate",
+                        text="Max updates/s")
+            layout.prop(scene, "prop_plasticity_apply_budget",
+                        text="Apply ms/frame")
+            if mesh_builder.count > 0:
+                build = mesh_builder.stats()
+                layout.label(text="Last build ms: " + ", ".join(
+                    stage + " " + str(round(build[stage]["last"], 1)) for stage in mesh_builder.stages))
             layout.separator()
 
             box = layout.box()
@@ -217,6 +306,9 @@ class PlasticityPanel(bpy.types.Panel):
                          text="Tolerance")
                 box.prop(scene, "prop_plasticity_facet_angle",
                          text="Angle")
+            stats = plasticity_client.geometry_cache.stats()
+            box.label(text="Cache: " + str(stats["hits"]) + " hits, " + str(
+                stats["misses"]) + " misses, " + str(stats["size"] >> 20) + " MB")
             layout.separator()
 
             box = layout.box()
@@ -0,0 +1,53 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from enum import Enum
+
+from . import decoder
+
+
+class DecodeBackend(Enum):
+    INLINE = "INLINE"
+    THREAD = "THREAD"
+
+
+# NOTE: Smaller messages are cheaper to index in place than to hand off to a worker.
+min_offload_size = 1 << 20
+
+
+class DecodePool:
+    def __init__(self):
+        self.backend = DecodeBackend.INLINE
+        self.threads = None
+
+    def configure(self, backend):
+        if backend != self.backend:
+            self.shutdown()
+            self.backend = backend
+
+    # NOTE: Returns ((message_type, index), buffer); decoded arrays are to be sliced out of buffer.
+    async def index(self, message, compact=False):
+        if self.backend == DecodeBackend.INLINE or len(message) < min_offload_size:
+            return decoder.index_message(memoryview(message), compact), message
+
+        index = await asyncio.get_running_loop().run_in_executor(
+            self.__threads(), decoder.index_message, memoryview(message), compact)
+        return index, message
+
+    # NOTE: Arrays are sliced out of the buffer off the event loop thread, unless decoding inline.
+    async def decode(self, function, index, buffer):
+        if self.backend == DecodeBackend.INLINE or len(buffer) < min_offload_size:
+            return function(index, decoder.word_views(buffer))
+
+        return await asyncio.get_running_loop().run_in_executor(
+            self.__threads(), function, index, decoder.word_views(buffer))
+
+    def __threads(self):
+        if self.threads is None:
+            self.threads = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="plasticity-decode")
+        return self.threads
+
+    def shutdown(self):
+        if self.threads is not None:
+            self.threads.shutdown(wait=False, cancel_futures=True)
+            self.threads = None